@@ -3,7 +3,17 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
 import streamlit as st
 import time
-from src.rag_pipeline import run_rag
+
+# RAG_SERVER_URL (e.g. http://127.0.0.1:8000, see src/server.py) makes
+# the UI a thin client; otherwise the engine runs in this process.
+RAG_SERVER_URL = os.environ.get("RAG_SERVER_URL")
+
+if RAG_SERVER_URL:
+    from src.rag_client import RAGClient
+    _client = RAGClient(RAG_SERVER_URL)
+    retrieve, run_rag, run_rag_stream = _client.retrieve, _client.run_rag, _client.run_rag_stream
+else:
+    from src.rag_pipeline import retrieve, run_rag, run_rag_stream
 
 # ---------------- PAGE CONFIG ----------------
 
@@ -44,6 +54,13 @@ final_k = st.sidebar.slider(
     value=5
 )
 
+# off by default: streaming decodes greedily, the default answers use
+# beam search (num_beams=2)
+stream = st.sidebar.checkbox(
+    "Stream Answer (greedy decoding)",
+    value=False
+)
+
 # ---------------- SESSION STATE ----------------
 
 if "result" not in st.session_state:
@@ -65,12 +82,68 @@ if st.button("Run Hybrid RAG") and query.strip():
 
     start = time.time()
 
-    st.session_state.result = run_rag(
-        query,
-        mode=mode,
-        top_k=top_k,
-        final_k=final_k
-    )
+    if stream:
+
+        # show sources and answer tokens as they arrive; the full
+        # output below replaces these placeholders when done
+        sources_box = st.empty()
+        answer_box = st.empty()
+        answer_text = ""
+
+        for event in run_rag_stream(
+            query,
+            mode=mode,
+            top_k=top_k,
+            final_k=final_k
+        ):
+
+            if event["type"] == "retrieval":
+                sources_box.markdown(
+                    "**Sources:**\n" +
+                    "\n".join(f"- {url}" for url in event["result"]["sources"])
+                )
+
+            elif event["type"] == "token":
+                answer_text += event["text"]
+                answer_box.info(answer_text + " ▌")
+
+            else:
+                st.session_state.result = event["result"]
+
+        sources_box.empty()
+        answer_box.empty()
+
+    else:
+
+        # two phases: sources show while the answer is generated. The
+        # answer comes from run_rag, which checks and fills the semantic
+        # cache and reuses the cached retrieval.
+        result = retrieve(
+            query,
+            mode=mode,
+            top_k=top_k,
+            final_k=final_k
+        )
+
+        if "answer" not in result:
+
+            sources_box = st.empty()
+            sources_box.markdown(
+                "**Sources:**\n" +
+                "\n".join(f"- {url}" for url in result["sources"])
+            )
+
+            with st.spinner("Generating answer..."):
+                result = run_rag(
+                    query,
+                    mode=mode,
+                    top_k=top_k,
+                    final_k=final_k
+                )
+
+            sources_box.empty()
+
+        st.session_state.result = result
 
     st.session_state.latency = round(time.time() - start, 3)
 
@@ -93,6 +166,12 @@ if st.session_state.result:
         st.metric("Latency (seconds)", latency)
         st.metric("Retrieval Mode", mode.upper())
 
+        timings = result.get("timings")
+        if timings:
+            st.caption(
+                " | ".join(f"{stage}: {seconds}s" for stage, seconds in timings.items())
+            )
+
     # ---------------- SOURCES ----------------
 
     st.subheader("Source Documents")
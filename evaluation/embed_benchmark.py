@@ -0,0 +1,201 @@
+"""
+Query Embedding Batching Benchmark: retrieval throughput and latency at
+several concurrency levels, with one MiniLM call per query (unbatched)
+vs. concurrent queries coalesced by the engine's embedding batcher.
+Threads call retrieve() (default hybrid mode), so the numbers include
+the dense / sparse split each request goes through; asyncio tasks call
+encode_queries_async().
+
+The query and response caches are disabled so every query reaches
+the model.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.rag_pipeline import RAGConfig, RAGEngine
+
+
+# ======================================================
+# CONFIGURATION
+# ======================================================
+
+QUESTIONS_PATH = "data/eval_questions.json"
+BENCHMARK_PATH = "data/embed_benchmark.json"
+
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+NUM_QUERIES = 256
+
+
+# ======================================================
+# RUNNERS (each query is one caller's request)
+# ======================================================
+
+def run_threads(engine, queries, concurrency, mode):
+    """concurrency threads retrieving one query at a time -> per-query latencies."""
+
+    latencies = []
+    position = iter(range(len(queries)))
+    lock = threading.Lock()
+
+    def caller():
+
+        while True:
+
+            with lock:
+                i = next(position, None)
+
+            if i is None:
+                return
+
+            start = time.perf_counter()
+            engine.retrieve(queries[i], mode=mode)
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return latencies
+
+
+def run_async(engine, queries, concurrency, mode):
+    """concurrency asyncio tasks encoding one query at a time."""
+
+    latencies = []
+
+    async def caller(position):
+
+        for i in position:
+            start = time.perf_counter()
+            await engine.encode_queries_async([queries[i]])
+            latencies.append(time.perf_counter() - start)
+
+    async def run():
+
+        position = iter(range(len(queries)))
+        await asyncio.gather(*(caller(position) for _ in range(concurrency)))
+
+    asyncio.run(run())
+
+    return latencies
+
+
+def measure(runner, engine, queries, concurrency, mode):
+
+    start = time.perf_counter()
+    latencies = np.array(runner(engine, queries, concurrency, mode)) * 1000
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput_qps": round(len(queries) / elapsed, 1),
+        "p50_latency_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_latency_ms": round(float(np.percentile(latencies, 95)), 2)
+    }
+
+
+# ======================================================
+# MAIN
+# ======================================================
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark query embedding micro-batching")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY_LEVELS,
+                        help="concurrent callers to test")
+    parser.add_argument("--num-queries", type=int, default=NUM_QUERIES,
+                        help="queries retrieved per run")
+    parser.add_argument("--mode", default="hybrid", choices=["dense", "hybrid"],
+                        help="retrieval mode of the threaded runs")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="max queries per batch (default RAG_EMBED_BATCH_SIZE)")
+    parser.add_argument("--wait-ms", type=float, default=None,
+                        help="max wait for a batch to fill (default RAG_EMBED_BATCH_WAIT_MS)")
+    parser.add_argument("--output", default=BENCHMARK_PATH)
+    args = parser.parse_args(argv)
+
+    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)]
+
+    # repeat the question set to the requested size
+    queries = [questions[i % len(questions)] for i in range(args.num_queries)]
+
+    overrides = {"query_cache_size": 0, "query_cache_path": None, "cache": False}
+
+    if args.batch_size is not None:
+        overrides["embed_batch_size"] = args.batch_size
+
+    if args.wait_ms is not None:
+        overrides["embed_batch_wait"] = args.wait_ms / 1000
+
+    unbatched = RAGEngine(RAGConfig.from_env(embed_batching=False, **overrides))
+    batched = RAGEngine(RAGConfig.from_env(embed_batching=True, **overrides))
+
+    # both engines share the registry's MiniLM; load everything
+    # retrieval needs and warm up before timing
+    components = ("corpus", "sparse", "dense", "embedder", "query_cache", "index_version")
+    unbatched.load(*components)
+    batched.load(*components)
+    unbatched.retrieve_batch(queries[:8], mode=args.mode)
+
+    config = batched.config
+
+    benchmark = {
+        "num_queries": len(queries),
+        "mode": args.mode,
+        "embed_batch_size": config.embed_batch_size,
+        "embed_batch_wait_ms": round(config.embed_batch_wait * 1000, 2),
+        "results": {}
+    }
+
+    print(f"Retrieving {len(queries)} queries ({args.mode}) "
+          f"| batch size {config.embed_batch_size} | max wait {benchmark['embed_batch_wait_ms']} ms")
+
+    for concurrency in args.concurrency:
+
+        row = {"unbatched": measure(run_threads, unbatched, queries, concurrency, args.mode)}
+
+        for name, runner in (("batched", run_threads), ("batched_async_encode", run_async)):
+
+            # a fresh batcher per run, so its stats cover this run only
+            batched.unload("embed_batcher")
+            row[name] = measure(runner, batched, queries, concurrency, args.mode)
+            row[name]["avg_batch_size"] = batched.stats()["embed_batcher"]["avg_batch_size"]
+
+        benchmark["results"][f"concurrency_{concurrency}"] = row
+
+        print(f"\nCONCURRENCY {concurrency}")
+        for name, stats in row.items():
+            print(f"  {name:<20} {stats['throughput_qps']:>8} q/s | "
+                  f"p50 {stats['p50_latency_ms']} ms | p95 {stats['p95_latency_ms']} ms"
+                  + (f" | avg batch {stats['avg_batch_size']}" if "avg_batch_size" in stats else ""))
+
+    batched.unload("embed_batcher")
+
+    # ======================================================
+    # SAVE RESULTS
+    # ======================================================
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(benchmark, f, indent=2)
+
+    print(f"\nSaved embedding benchmark → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
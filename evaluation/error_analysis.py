@@ -12,19 +12,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
 # ======================================================
-# LOAD RESULTS AND QUESTIONS
+# PATHS
 # ======================================================
 
 EVAL_RESULTS_PATH = "data/eval_results.json"
 EVAL_QUESTIONS_PATH = "data/eval_questions.json"
 ERROR_ANALYSIS_PATH = "data/error_analysis.json"
 
-with open(EVAL_RESULTS_PATH, "r", encoding="utf-8") as f:
-    all_results = json.load(f)
-
-with open(EVAL_QUESTIONS_PATH, "r", encoding="utf-8") as f:
-    questions_lookup = {q["question"]: q for q in json.load(f)}
-
 
 # ======================================================
 # ERROR CATEGORIZATION
@@ -70,114 +64,129 @@ def get_question_type(question):
         return "other"
 
 
-# ======================================================
-# ANALYZE ERRORS BY MODE
-# ======================================================
+def main():
 
-error_analysis = {}
+    # ======================================================
+    # LOAD RESULTS AND QUESTIONS
+    # ======================================================
 
-for mode in ["dense", "sparse", "hybrid"]:
-    mode_results = [r for r in all_results if r["mode"] == mode]
-    
-    error_breakdown = defaultdict(list)
-    question_type_breakdown = defaultdict(lambda: defaultdict(int))
-    
-    for result in mode_results:
-        question = result["question"]
-        error_type = categorize_error(result)
-        question_type = get_question_type(question)
-        
-        error_breakdown[error_type].append(result)
-        question_type_breakdown[question_type][error_type] += 1
-    
-    # Calculate statistics
-    total = len(mode_results)
-    stats = {
-        "Total_Questions": total,
-        "Success_Count": len(error_breakdown.get("success", [])),
-        "Success_Rate": round(len(error_breakdown.get("success", [])) / total * 100, 2) if total > 0 else 0,
-        "Failure_Count": total - len(error_breakdown.get("success", [])),
-        "Failure_Rate": round((total - len(error_breakdown.get("success", []))) / total * 100, 2) if total > 0 else 0,
-    }
-    
-    # Error type distribution
-    error_distribution = {}
-    for error_type, results in error_breakdown.items():
-        error_distribution[error_type] = {
-            "count": len(results),
-            "percentage": round(len(results) / total * 100, 2) if total > 0 else 0
-        }
-    
-    # Question type analysis
-    question_type_stats = {}
-    for qtype, error_counts in question_type_breakdown.items():
-        total_qtype = sum(error_counts.values())
-        success_count = error_counts.get("success", 0)
-        question_type_stats[qtype] = {
-            "total": total_qtype,
-            "success": success_count,
-            "success_rate": round(success_count / total_qtype * 100, 2) if total_qtype > 0 else 0,
-            "error_distribution": dict(error_counts)
+    with open(EVAL_RESULTS_PATH, "r", encoding="utf-8") as f:
+        all_results = json.load(f)
+
+    with open(EVAL_QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        questions_lookup = {q["question"]: q for q in json.load(f)}
+
+    # ======================================================
+    # ANALYZE ERRORS BY MODE
+    # ======================================================
+
+    error_analysis = {}
+
+    for mode in ["dense", "sparse", "hybrid"]:
+        mode_results = [r for r in all_results if r["mode"] == mode]
+
+        error_breakdown = defaultdict(list)
+        question_type_breakdown = defaultdict(lambda: defaultdict(int))
+
+        for result in mode_results:
+            question = result["question"]
+            error_type = categorize_error(result)
+            question_type = get_question_type(question)
+
+            error_breakdown[error_type].append(result)
+            question_type_breakdown[question_type][error_type] += 1
+
+        # Calculate statistics
+        total = len(mode_results)
+        stats = {
+            "Total_Questions": total,
+            "Success_Count": len(error_breakdown.get("success", [])),
+            "Success_Rate": round(len(error_breakdown.get("success", [])) / total * 100, 2) if total > 0 else 0,
+            "Failure_Count": total - len(error_breakdown.get("success", [])),
+            "Failure_Rate": round((total - len(error_breakdown.get("success", []))) / total * 100, 2) if total > 0 else 0,
         }
-    
-    error_analysis[mode] = {
-        "statistics": stats,
-        "error_distribution": error_distribution,
-        "question_type_analysis": question_type_stats,
-        "failed_examples": {
-            "not_found": [
-                {
-                    "question": r["question"],
-                    "ground_truth": r["ground_truth_url"],
-                    "retrieved": r["retrieved_urls"][:5]
-                }
-                for r in error_breakdown.get("not_found", [])[:3]
-            ],
-            "low_rank": [
-                {
-                    "question": r["question"],
-                    "rank": r["rank"],
-                    "ground_truth": r["ground_truth_url"],
-                    "retrieved": r["retrieved_urls"][:5]
-                }
-                for r in error_breakdown.get("rank_11_20", [])[:3]
-            ]
+
+        # Error type distribution
+        error_distribution = {}
+        for error_type, results in error_breakdown.items():
+            error_distribution[error_type] = {
+                "count": len(results),
+                "percentage": round(len(results) / total * 100, 2) if total > 0 else 0
+            }
+
+        # Question type analysis
+        question_type_stats = {}
+        for qtype, error_counts in question_type_breakdown.items():
+            total_qtype = sum(error_counts.values())
+            success_count = error_counts.get("success", 0)
+            question_type_stats[qtype] = {
+                "total": total_qtype,
+                "success": success_count,
+                "success_rate": round(success_count / total_qtype * 100, 2) if total_qtype > 0 else 0,
+                "error_distribution": dict(error_counts)
+            }
+
+        error_analysis[mode] = {
+            "statistics": stats,
+            "error_distribution": error_distribution,
+            "question_type_analysis": question_type_stats,
+            "failed_examples": {
+                "not_found": [
+                    {
+                        "question": r["question"],
+                        "ground_truth": r["ground_truth_url"],
+                        "retrieved": r["retrieved_urls"][:5]
+                    }
+                    for r in error_breakdown.get("not_found", [])[:3]
+                ],
+                "low_rank": [
+                    {
+                        "question": r["question"],
+                        "rank": r["rank"],
+                        "ground_truth": r["ground_truth_url"],
+                        "retrieved": r["retrieved_urls"][:5]
+                    }
+                    for r in error_breakdown.get("rank_11_20", [])[:3]
+                ]
+            }
         }
-    }
 
+    # ======================================================
+    # SAVE ERROR ANALYSIS
+    # ======================================================
 
-# ======================================================
-# SAVE ERROR ANALYSIS
-# ======================================================
+    os.makedirs("data", exist_ok=True)
 
-os.makedirs("data", exist_ok=True)
+    with open(ERROR_ANALYSIS_PATH, "w", encoding="utf-8") as f:
+        json.dump(error_analysis, f, indent=2)
 
-with open(ERROR_ANALYSIS_PATH, "w", encoding="utf-8") as f:
-    json.dump(error_analysis, f, indent=2)
+    print(f"Saved error analysis → {ERROR_ANALYSIS_PATH}")
 
-print(f"Saved error analysis → {ERROR_ANALYSIS_PATH}")
+    # ======================================================
+    # PRINT SUMMARY
+    # ======================================================
 
-# ======================================================
-# PRINT SUMMARY
-# ======================================================
+    print("\n" + "="*60)
+    print("ERROR ANALYSIS SUMMARY")
+    print("="*60)
 
-print("\n" + "="*60)
-print("ERROR ANALYSIS SUMMARY")
-print("="*60)
+    for mode, analysis in error_analysis.items():
+        print(f"\n{mode.upper()} MODE")
+        print("-" * 40)
 
-for mode, analysis in error_analysis.items():
-    print(f"\n{mode.upper()} MODE")
-    print("-" * 40)
-    
-    stats = analysis["statistics"]
-    print(f"Total Questions: {stats['Total_Questions']}")
-    print(f"Success Rate: {stats['Success_Rate']}%")
-    print(f"Failure Rate: {stats['Failure_Rate']}%")
-    
-    print(f"\nError Distribution:")
-    for error_type, dist in analysis["error_distribution"].items():
-        print(f"  {error_type}: {dist['count']} ({dist['percentage']}%)")
-    
-    print(f"\nBy Question Type:")
-    for qtype, qstats in analysis["question_type_analysis"].items():
-        print(f"  {qtype}: {qstats['success']}/{qstats['total']} correct ({qstats['success_rate']}%)")
+        stats = analysis["statistics"]
+        print(f"Total Questions: {stats['Total_Questions']}")
+        print(f"Success Rate: {stats['Success_Rate']}%")
+        print(f"Failure Rate: {stats['Failure_Rate']}%")
+
+        print(f"\nError Distribution:")
+        for error_type, dist in analysis["error_distribution"].items():
+            print(f"  {error_type}: {dist['count']} ({dist['percentage']}%)")
+
+        print(f"\nBy Question Type:")
+        for qtype, qstats in analysis["question_type_analysis"].items():
+            print(f"  {qtype}: {qstats['success']}/{qstats['total']} correct ({qstats['success_rate']}%)")
+
+
+if __name__ == "__main__":
+    main()
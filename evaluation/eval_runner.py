@@ -1,5 +1,6 @@
+import argparse
 import json
-import time
+from multiprocessing import Pool
 from tqdm import tqdm
 import sys
 import os
@@ -7,8 +8,7 @@ import os
 # ---------- PATH FIX ----------
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from src.rag_pipeline import run_rag
-from evaluation.metrics import mean_reciprocal_rank, recall_at_k
+from evaluation.metrics import rouge_score, bleu_score, compute_semantic_similarity_batch
 
 
 # ---------- PATHS ----------
@@ -17,38 +17,75 @@ QUESTIONS_PATH = "data/eval_questions.json"
 RESULTS_PATH = "data/eval_results.json"
 SUMMARY_PATH = "data/eval_summary.json"
 
+# checkpoint: one JSON line per (question, mode), appended as questions
+# finish; runs with --answers keep their own file
+CHECKPOINT_PATHS = {
+    False: "data/eval_results.jsonl",
+    True: "data/eval_results_answers.jsonl"
+}
+
 MODES = ["dense", "sparse", "hybrid"]
 
+# generated / reference pairs per semantic-similarity call
+SIMILARITY_CHUNK = 256
 
-# ---------- LOAD QUESTIONS ----------
 
-with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
-    questions = json.load(f)
+# ======================================================
+# ---------------- EVALUATE ONE QUESTION ---------------
+# ======================================================
 
-print("Loaded", len(questions), "evaluation questions")
+_answers = False
+_use_cache = False
 
 
-all_results = []
-latencies = {mode: [] for mode in MODES}
+def _init_worker(answers, use_cache=False):
+    """
+    Load the pipeline (models + indexes) once per process, before the
+    first question, so load time is not counted as question latency.
+    """
 
+    global _answers, _use_cache, run_rag_modes
 
-# ======================================================
-# ---------------- RUN EVALUATION ----------------------
-# ======================================================
+    _answers = answers
+    _use_cache = use_cache
+
+    from src.rag_pipeline import get_engine, run_rag_modes
+
+    components = ["corpus", "sparse", "dense", "embedder", "query_cache"]
+
+    # flan-t5 only when answers are generated; the answer cache only
+    # with --use-cache (cached answers have no generation latency)
+    if answers:
+        components += ["generator", "gen_batcher"]
+
+    if answers and use_cache:
+        components += ["index_version", "response_cache"]
+
+    get_engine().load(*components)
 
-for item in tqdm(questions):
+
+def evaluate_question(task):
+    """(question_id, item) -> one result dict per mode."""
+
+    question_id, item = task
 
     question = item["question"]
     gt_url = item["source_url"]
 
-    for mode in MODES:
+    # dense and sparse retrieval run once; all modes reuse them. Cached
+    # answers report no generation time, so they are only used with
+    # --use-cache (and counted in the summary).
+    mode_outputs = run_rag_modes(question, modes=MODES, generate=_answers, use_cache=_use_cache)
 
-        start = time.time()
+    results = []
+
+    for mode in MODES:
 
-        rag_output = run_rag(question, mode=mode)
+        rag_output = mode_outputs[mode]
 
-        latency = round(time.time() - start, 3)
-        latencies[mode].append(latency)
+        # per-mode latency as if the mode ran on its own
+        timings = rag_output.get("timings", {})
+        latency = round(timings.get("total" if _answers else "retrieval", 0.0), 3)
 
         predicted_urls = rag_output.get("sources", [])
 
@@ -61,63 +98,283 @@ for item in tqdm(questions):
 
         rr = 1 / rank if rank else 0
 
-        all_results.append({
+        result = {
+            "question_id": question_id,
             "mode": mode,
             "question": question,
             "ground_truth_url": gt_url,
             "ground_truth_answer": item.get("answer", ""),
-            "generated_answer": rag_output.get("answer", ""),
             "retrieved_urls": predicted_urls,
-            "context": " ".join(rag_output.get("final_context", [{}])[:3] if rag_output.get("final_context") else []),
+            "context": " ".join(
+                chunk["chunk"] for chunk in rag_output.get("final_context", [])[:3]
+            ),
             "rank": rank,
             "reciprocal_rank": rr,
             "latency": latency
-        })
+        }
+
+        if _answers:
+            result["generated_answer"] = rag_output.get("answer", "")
+            result["cached_answer"] = rag_output.get("cache", {}).get("answer") == "hit"
+
+        results.append(result)
+
+    return results
 
 
 # ======================================================
-# ---------------- METRICS PER MODE --------------------
+# ---------------- CHECKPOINT FILE ---------------------
 # ======================================================
 
-summary = {}
+def iter_results(path):
+    """Results from a checkpoint file, first copy of each (question, mode)."""
+
+    if not os.path.exists(path):
+        return
+
+    seen = set()
 
-print("\n========== FINAL RESULTS ==========")
+    with open(path, "r", encoding="utf-8") as f:
 
-for mode in MODES:
+        for line in f:
 
-    mode_results = [r for r in all_results if r["mode"] == mode]
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn write from an interrupted run
 
-    mrr = mean_reciprocal_rank(mode_results)
-    recall5 = recall_at_k(mode_results, k=5)
+            key = (result["question_id"], result["question"], result["mode"])
 
-    avg_latency = round(sum(latencies[mode]) / len(latencies[mode]), 3)
+            if key not in seen:
+                seen.add(key)
+                yield result
 
-    summary[mode] = {
-        "MRR": round(mrr, 4),
-        "Recall@5": round(recall5, 4),
-        "Average_Latency": avg_latency,
-        "Total_Questions": len(mode_results)
+
+def prepare_checkpoint(path, fresh=False):
+    """
+    Open the checkpoint for appending and return the (question_id,
+    question) pairs already evaluated in every mode.
+    """
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    if fresh and os.path.exists(path):
+        os.remove(path)
+
+    if not os.path.exists(path):
+        return set()
+
+    # drop a partial last line so new results start on a fresh line
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    modes_done = {}
+
+    for result in iter_results(path):
+        key = (result["question_id"], result["question"])
+        modes_done.setdefault(key, set()).add(result["mode"])
+
+    return {key for key, modes in modes_done.items() if modes >= set(MODES)}
+
+
+# ======================================================
+# ---------------- STREAMING SUMMARY -------------------
+# ======================================================
+
+def summarize(path, answers):
+    """Per-mode metrics from one pass over the checkpoint file."""
+
+    totals = {
+        mode: {"count": 0, "rr": 0.0, "hits5": 0, "latency": 0.0, "cached": 0,
+               "rouge": [0.0, 0], "bleu": [0.0, 0], "similarity": [0.0, 0]}
+        for mode in MODES
     }
+    pending = {mode: [] for mode in MODES}
+
+    def flush_similarity(mode):
+
+        pairs = pending[mode]
+        if pairs:
+            totals[mode]["similarity"][0] += compute_semantic_similarity_batch(pairs) * len(pairs)
+            totals[mode]["similarity"][1] += len(pairs)
+            pairs.clear()
+
+    for result in iter_results(path):
+
+        mode = result["mode"]
+        t = totals[mode]
+
+        t["count"] += 1
+        t["rr"] += result["reciprocal_rank"]
+        t["hits5"] += result["ground_truth_url"] in result["retrieved_urls"][:5]
+        t["latency"] += result["latency"]
+        t["cached"] += bool(result.get("cached_answer"))
+
+        gen = result.get("generated_answer", "")
+        ref = result.get("ground_truth_answer", "")
 
-    print(f"\nMODE: {mode.upper()}")
-    print("MRR:", round(mrr, 4))
-    print("Recall@5:", round(recall5, 4))
-    print("Avg Latency:", avg_latency, "sec")
+        if answers and gen and ref:
+
+            t["rouge"][0] += rouge_score(gen, ref)
+            t["rouge"][1] += 1
+            t["bleu"][0] += bleu_score(gen, ref)
+            t["bleu"][1] += 1
+
+            pending[mode].append({"generated_answer": gen, "ground_truth_answer": ref})
+            if len(pending[mode]) >= SIMILARITY_CHUNK:
+                flush_similarity(mode)
+
+    summary = {}
+
+    for mode, t in totals.items():
+
+        if not t["count"]:
+            continue
+
+        summary[mode] = {
+            "MRR": round(t["rr"] / t["count"], 4),
+            "Recall@5": round(t["hits5"] / t["count"], 4),
+            "Average_Latency": round(t["latency"] / t["count"], 3),
+            "Latency_Scope": "end_to_end" if answers else "retrieval",
+            "Total_Questions": t["count"]
+        }
+
+        if answers:
+
+            # answers served from the cache (--use-cache): their latency
+            # has no generation time in it
+            summary[mode]["Cached_Answers"] = t["cached"]
+
+            flush_similarity(mode)
+
+            for name, key in (("ROUGE-L", "rouge"), ("BLEU", "bleu"),
+                              ("Semantic_Similarity", "similarity")):
+                total, n = t[key]
+                summary[mode][name] = round(float(total / n), 4) if n else 0.0
+
+    return summary
+
+
+def export_results(path, out_path):
+    """Write the checkpoint as the JSON array other scripts read."""
+
+    with open(out_path, "w", encoding="utf-8") as f:
+
+        f.write("[")
+
+        for i, result in enumerate(iter_results(path)):
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps(result, indent=2))
+
+        f.write("\n]\n")
 
 
 # ======================================================
-# ---------------- SAVE RESULTS ------------------------
+# ---------------- MAIN --------------------------------
 # ======================================================
 
-os.makedirs("evaluation/results", exist_ok=True)
+def main(argv=None):
+
+    # MRR / Recall@5 only need the ranked sources, so by default the
+    # pipeline runs retrieval only. --answers also generates answers and
+    # adds ROUGE-L / BLEU / semantic similarity (needed by llm_judge.py).
+
+    parser = argparse.ArgumentParser(description="Evaluate dense, sparse and hybrid retrieval")
+    parser.add_argument(
+        "--answers",
+        action="store_true",
+        help="generate answers and compute answer-quality metrics"
+    )
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="reuse cached answers (faster, but their latency excludes generation)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes, each loading its own pipeline"
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="discard the checkpoint instead of resuming from it"
+    )
+    args = parser.parse_args(argv)
+
+    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    checkpoint_path = CHECKPOINT_PATHS[args.answers]
+    done = prepare_checkpoint(checkpoint_path, fresh=args.fresh)
+
+    tasks = [
+        (i, item) for i, item in enumerate(questions)
+        if (i, item["question"]) not in done
+    ]
+
+    print("Loaded", len(questions), "evaluation questions")
+    print("Generating answers:", "yes" if args.answers else "no (retrieval only)")
+    print(f"Already evaluated: {len(questions) - len(tasks)} | to run: {len(tasks)}")
+
+    if tasks:
+
+        with open(checkpoint_path, "a", encoding="utf-8") as out:
+
+            def write(results):
+                out.write("".join(json.dumps(r) + "\n" for r in results))
+                out.flush()
+
+            if args.workers > 1:
+
+                with Pool(args.workers, initializer=_init_worker,
+                          initargs=(args.answers, args.use_cache)) as pool:
+                    for results in tqdm(pool.imap_unordered(evaluate_question, tasks), total=len(tasks)):
+                        write(results)
+
+            else:
+
+                _init_worker(args.answers, args.use_cache)
+
+                for task in tqdm(tasks):
+                    write(evaluate_question(task))
+
+    # ======================================================
+    # ---------------- METRICS PER MODE --------------------
+    # ======================================================
+
+    summary = summarize(checkpoint_path, args.answers)
+
+    print("\n========== FINAL RESULTS ==========")
+
+    for mode, metrics in summary.items():
+
+        print(f"\nMODE: {mode.upper()}")
+        print("MRR:", metrics["MRR"])
+        print("Recall@5:", metrics["Recall@5"])
+        print("Avg Latency:", metrics["Average_Latency"], "sec")
+
+        if args.answers:
+            print("ROUGE-L:", metrics["ROUGE-L"])
+            print("BLEU:", metrics["BLEU"])
+            print("Semantic Similarity:", metrics["Semantic_Similarity"])
+
+    # ======================================================
+    # ---------------- SAVE RESULTS ------------------------
+    # ======================================================
+
+    export_results(checkpoint_path, RESULTS_PATH)
 
-with open(RESULTS_PATH, "w", encoding="utf-8") as f:
-    json.dump(all_results, f, indent=2)
+    print("\nSaved detailed results →", RESULTS_PATH)
 
-print("\nSaved detailed results →", RESULTS_PATH)
+    with open(SUMMARY_PATH, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
 
+    print("Saved summary metrics →", SUMMARY_PATH)
 
-with open(SUMMARY_PATH, "w", encoding="utf-8") as f:
-    json.dump(summary, f, indent=2)
 
-print("Saved summary metrics →", SUMMARY_PATH)
+if __name__ == "__main__":
+    main()
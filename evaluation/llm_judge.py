@@ -4,8 +4,14 @@ LLM-as-Judge Evaluation: Use LLM to evaluate answer quality on multiple dimensio
 - Completeness
 - Relevance to question
 - Coherence and clarity
+
+Prompts for all answers and dimensions are scored in padded batches,
+either by reading the "1"-"5" token logits of the first decoder step
+(--scoring logits, default) or by greedy generation (--scoring generate).
+Judgments are cached by a hash of the model, scoring mode and prompt.
 """
 
+import argparse
 import json
 import os
 import sys
@@ -13,19 +19,21 @@ from tqdm import tqdm
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import numpy as np
 import torch
 
+from src.model_registry import get_seq2seq
+from src.response_cache import ResponseCache
+
 
 # ======================================================
 # LOAD JUDGE MODEL
 # ======================================================
 
 MODEL_NAME = "google/flan-t5-base"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
-model.to("cpu")
-model.eval()
+
+# shared with the RAG pipeline's generator when run from pipeline.py
+tokenizer, model = get_seq2seq(MODEL_NAME, device="cpu")
 
 
 # ======================================================
@@ -37,19 +45,19 @@ JUDGE_PROMPTS = {
 Context: {context}
 Ground Truth Answer: {reference}
 Generated Answer: {generated}
-Rate on scale 1-5 (1=completely wrong, 5=completely accurate): """
-    
+Rate on scale 1-5 (1=completely wrong, 5=completely accurate): """,
+
     "completeness": """Evaluate how complete the answer is compared to the reference.
 Question: {question}
 Reference Answer: {reference}
 Generated Answer: {generated}
-Does it address all parts? Rate 1-5 (1=missing key points, 5=fully complete): """
-    
+Does it address all parts? Rate 1-5 (1=missing key points, 5=fully complete): """,
+
     "relevance": """Evaluate how relevant the generated answer is to the question.
 Question: {question}
 Answer: {generated}
-Is the answer directly addressing the question? Rate 1-5 (1=irrelevant, 5=highly relevant): """
-    
+Is the answer directly addressing the question? Rate 1-5 (1=irrelevant, 5=highly relevant): """,
+
     "coherence": """Evaluate the coherence and clarity of this answer.
 Answer: {generated}
 Is the answer clear, logical and well-structured? Rate 1-5 (1=incoherent, 5=very coherent): """
@@ -57,53 +65,21 @@ Is the answer clear, logical and well-structured? Rate 1-5 (1=incoherent, 5=very
 
 
 # ======================================================
-# EVALUATE ANSWER WITH LLM
+# RATE PROMPTS IN BATCHES
 # ======================================================
 
-def evaluate_answer(question, generated, reference, context=""):
-    """
-    Evaluate answer across multiple dimensions using LLM
-    """
-    
-    judgments = {}
-    
-    for dimension, prompt_template in JUDGE_PROMPTS.items():
-        # Create prompt
-        prompt = prompt_template.format(
-            question=question,
-            generated=generated[:500],  # Limit length
-            reference=reference[:500],
-            context=context[:300]
-        )
-        
-        try:
-            # Tokenize and generate
-            inputs = tokenizer(
-                prompt,
-                return_tensors="pt",
-                truncation=True,
-                max_length=512
-            )
-            
-            with torch.no_grad():
-                outputs = model.generate(
-                    inputs["input_ids"],
-                    max_new_tokens=10,
-                    num_beams=1,
-                    do_sample=False
-                )
-            
-            response = tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
-            
-            # Extract score (1-5)
-            score = extract_score(response)
-            judgments[dimension] = score
-        
-        except Exception as e:
-            print(f"Error evaluating {dimension}: {e}")
-            judgments[dimension] = 3  # Default middle score
-    
-    return judgments
+MAX_INPUT_LENGTH = 512
+RATINGS = [1, 2, 3, 4, 5]
+
+
+def build_prompt(dimension, question, generated, reference, context=""):
+
+    return JUDGE_PROMPTS[dimension].format(
+        question=question,
+        generated=generated[:500],  # Limit length
+        reference=reference[:500],
+        context=context[:300]
+    )
 
 
 def extract_score(response):
@@ -119,6 +95,133 @@ def extract_score(response):
     return 3
 
 
+def _tokenize(prompts):
+
+    return tokenizer(
+        prompts,
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+        max_length=MAX_INPUT_LENGTH
+    )
+
+
+def _rate_generate(prompts):
+    """Greedy-decode a short answer per prompt and take its first digit."""
+
+    inputs = _tokenize(prompts)
+
+    with torch.no_grad():
+        outputs = model.generate(
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_new_tokens=10,
+            num_beams=1,
+            do_sample=False
+        )
+
+    return [
+        extract_score(response.strip())
+        for response in tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    ]
+
+
+# vocabulary ids of "1".."5" as the first answer token
+RATING_TOKEN_IDS = [
+    tokenizer.encode(str(r), add_special_tokens=False)[-1] for r in RATINGS
+]
+
+
+def _rate_logits(prompts):
+    """
+    One encoder-decoder forward pass: softmax over the logits of the
+    "1".."5" tokens at the first decoder step; the score is the
+    expected rating.
+    """
+
+    inputs = _tokenize(prompts)
+
+    decoder_input_ids = torch.full(
+        (len(prompts), 1), model.config.decoder_start_token_id, dtype=torch.long
+    )
+
+    with torch.no_grad():
+        logits = model(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            decoder_input_ids=decoder_input_ids
+        ).logits[:, 0, RATING_TOKEN_IDS]
+
+    probs = torch.softmax(logits.float(), dim=-1).numpy()
+
+    return [round(float(p), 3) for p in probs @ np.array(RATINGS, dtype="float32")]
+
+
+RATERS = {"logits": _rate_logits, "generate": _rate_generate}
+
+
+def rate_prompts(prompts, scoring="logits", batch_size=16, cache=None):
+    """
+    Scores for prompts in order. Cached and repeated prompts are not
+    rescored; the rest are sorted by length so each padded batch
+    holds similar sizes.
+    """
+
+    rate = RATERS[scoring]
+
+    keys = [ResponseCache.make_key("judge", MODEL_NAME, scoring, p) for p in prompts]
+
+    # key -> score, one entry per distinct prompt
+    scored = {}
+    todo = {}
+
+    for key, prompt in zip(keys, prompts):
+
+        if key in scored or key in todo:
+            continue
+
+        cached = cache.get(key) if cache else None
+
+        if cached is None:
+            todo[key] = prompt
+        else:
+            scored[key] = cached
+
+    todo = sorted(todo.items(), key=lambda item: len(item[1]))
+
+    for start in tqdm(range(0, len(todo), batch_size)):
+
+        batch = todo[start:start + batch_size]
+
+        try:
+            batch_scores = rate([prompt for _, prompt in batch])
+        except Exception as e:
+            print(f"Error scoring batch: {e}")
+            for key, _ in batch:
+                scored[key] = 3  # Default middle score, not cached
+            continue
+
+        for (key, _), score in zip(batch, batch_scores):
+            scored[key] = score
+            if cache:
+                cache.put(key, score)
+
+    return [scored[key] for key in keys]
+
+
+def evaluate_answer(question, generated, reference, context="", scoring="logits", cache=None):
+    """
+    Evaluate answer across multiple dimensions using LLM
+    """
+
+    prompts = [
+        build_prompt(dimension, question, generated, reference, context)
+        for dimension in JUDGE_PROMPTS
+    ]
+
+    return dict(zip(JUDGE_PROMPTS, rate_prompts(prompts, scoring, cache=cache)))
+
+
 # ======================================================
 # BATCH EVALUATE RESULTS
 # ======================================================
@@ -126,101 +229,131 @@ def extract_score(response):
 EVAL_RESULTS_PATH = "data/eval_results.json"
 LLM_JUDGE_RESULTS_PATH = "data/llm_judge_results.json"
 LLM_JUDGE_SUMMARY_PATH = "data/llm_judge_summary.json"
+LLM_JUDGE_CACHE_PATH = "data/llm_judge_cache.sqlite"
 
-# Load evaluation results
-with open(EVAL_RESULTS_PATH, "r", encoding="utf-8") as f:
-    eval_results = json.load(f)
 
-print(f"Loaded {len(eval_results)} evaluation results")
-print(f"Running LLM-as-Judge evaluation on {len(eval_results)} answers...")
+def main(argv=None):
 
-llm_judge_results = []
-mode_scores = {
-    "dense": [],
-    "sparse": [],
-    "hybrid": []
-}
+    parser = argparse.ArgumentParser(description="LLM-as-judge answer evaluation")
+    parser.add_argument("--scoring", choices=sorted(RATERS), default="logits",
+                        help="logits: one forward pass per prompt; generate: decode a digit")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached judgments")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else ResponseCache(LLM_JUDGE_CACHE_PATH, maxsize=0)
+
+    # Load evaluation results
+    with open(EVAL_RESULTS_PATH, "r", encoding="utf-8") as f:
+        eval_results = json.load(f)
 
-for result in tqdm(eval_results):
-    
-    question = result["question"]
-    generated = result.get("generated_answer", "No answer provided")
-    reference = result.get("ground_truth_answer", "")
-    context = result.get("context", "")
-    mode = result["mode"]
-    
     # Skip if no reference answer
-    if not reference:
-        continue
-    
-    # Evaluate with LLM-as-Judge
-    judgments = evaluate_answer(question, generated, reference, context)
-    
-    # Calculate average score across dimensions
-    avg_score = sum(judgments.values()) / len(judgments) if judgments else 0
-    
-    llm_judge_results.append({
-        "mode": mode,
-        "question": question,
-        "generated_answer": generated,
-        "ground_truth_answer": reference,
-        "judge_scores": judgments,
-        "average_score": avg_score
-    })
-    
-    if mode in mode_scores:
-        mode_scores[mode].append(avg_score)
+    to_judge = [r for r in eval_results if r.get("ground_truth_answer", "")]
+
+    # eval_runner only generates answers with --answers; judging its
+    # retrieval-only results would rate placeholders
+    if any("generated_answer" not in r for r in to_judge):
+        sys.exit(
+            f"{EVAL_RESULTS_PATH} has no generated answers. "
+            "Run: python3 evaluation/eval_runner.py --answers"
+        )
 
+    print(f"Loaded {len(eval_results)} evaluation results")
+    print(f"Running LLM-as-Judge evaluation on {len(to_judge)} answers "
+          f"({args.scoring} scoring, batch size {args.batch_size})...")
+
+    prompts = [
+        build_prompt(
+            dimension,
+            result["question"],
+            result["generated_answer"],
+            result["ground_truth_answer"],
+            result.get("context", "")
+        )
+        for result in to_judge
+        for dimension in JUDGE_PROMPTS
+    ]
 
-# ======================================================
-# COMPUTE STATISTICS
-# ======================================================
+    prompt_scores = rate_prompts(prompts, args.scoring, args.batch_size, cache)
 
-import numpy as np
+    llm_judge_results = []
+    mode_scores = {
+        "dense": [],
+        "sparse": [],
+        "hybrid": []
+    }
 
-llm_judge_summary = {}
+    n_dims = len(JUDGE_PROMPTS)
 
-for mode, scores in mode_scores.items():
-    if scores:
-        llm_judge_summary[mode] = {
-            "average_judge_score": round(np.mean(scores), 2),
-            "median_judge_score": round(np.median(scores), 2),
-            "std_judge_score": round(np.std(scores), 2),
-            "min_score": round(min(scores), 2),
-            "max_score": round(max(scores), 2),
-            "evaluated_questions": len(scores)
-        }
+    for i, result in enumerate(to_judge):
 
+        judgments = dict(zip(JUDGE_PROMPTS, prompt_scores[i * n_dims:(i + 1) * n_dims]))
 
-# ======================================================
-# SAVE RESULTS
-# ======================================================
+        # Calculate average score across dimensions
+        avg_score = sum(judgments.values()) / len(judgments) if judgments else 0
 
-os.makedirs("data", exist_ok=True)
+        llm_judge_results.append({
+            "mode": result["mode"],
+            "question": result["question"],
+            "generated_answer": result["generated_answer"],
+            "ground_truth_answer": result["ground_truth_answer"],
+            "judge_scores": judgments,
+            "average_score": avg_score
+        })
 
-with open(LLM_JUDGE_RESULTS_PATH, "w", encoding="utf-8") as f:
-    json.dump(llm_judge_results, f, indent=2)
+        if result["mode"] in mode_scores:
+            mode_scores[result["mode"]].append(avg_score)
 
-print(f"Saved LLM judge results → {LLM_JUDGE_RESULTS_PATH}")
+    # ======================================================
+    # COMPUTE STATISTICS
+    # ======================================================
 
-with open(LLM_JUDGE_SUMMARY_PATH, "w", encoding="utf-8") as f:
-    json.dump(llm_judge_summary, f, indent=2)
+    llm_judge_summary = {}
 
-print(f"Saved LLM judge summary → {LLM_JUDGE_SUMMARY_PATH}")
+    for mode, scores in mode_scores.items():
+        if scores:
+            llm_judge_summary[mode] = {
+                "average_judge_score": round(np.mean(scores), 2),
+                "median_judge_score": round(np.median(scores), 2),
+                "std_judge_score": round(np.std(scores), 2),
+                "min_score": round(min(scores), 2),
+                "max_score": round(max(scores), 2),
+                "evaluated_questions": len(scores)
+            }
+
+    # ======================================================
+    # SAVE RESULTS
+    # ======================================================
+
+    os.makedirs("data", exist_ok=True)
+
+    with open(LLM_JUDGE_RESULTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(llm_judge_results, f, indent=2)
+
+    print(f"Saved LLM judge results → {LLM_JUDGE_RESULTS_PATH}")
+
+    with open(LLM_JUDGE_SUMMARY_PATH, "w", encoding="utf-8") as f:
+        json.dump(llm_judge_summary, f, indent=2)
+
+    print(f"Saved LLM judge summary → {LLM_JUDGE_SUMMARY_PATH}")
+
+    # ======================================================
+    # PRINT SUMMARY
+    # ======================================================
+
+    print("\n" + "="*60)
+    print("LLM-AS-JUDGE EVALUATION SUMMARY")
+    print("="*60)
+
+    for mode, stats in llm_judge_summary.items():
+        print(f"\n{mode.upper()} MODE")
+        print("-" * 40)
+        print(f"Average Judge Score: {stats['average_judge_score']}/5.0")
+        print(f"Median Judge Score: {stats['median_judge_score']}/5.0")
+        print(f"Score Std. Dev: {stats['std_judge_score']}")
+        print(f"Range: {stats['min_score']} - {stats['max_score']}")
+        print(f"Questions Evaluated: {stats['evaluated_questions']}")
 
-# ======================================================
-# PRINT SUMMARY
-# ======================================================
 
-print("\n" + "="*60)
-print("LLM-AS-JUDGE EVALUATION SUMMARY")
-print("="*60)
-
-for mode, stats in llm_judge_summary.items():
-    print(f"\n{mode.upper()} MODE")
-    print("-" * 40)
-    print(f"Average Judge Score: {stats['average_judge_score']}/5.0")
-    print(f"Median Judge Score: {stats['median_judge_score']}/5.0")
-    print(f"Score Std. Dev: {stats['std_judge_score']}")
-    print(f"Range: {stats['min_score']} - {stats['max_score']}")
-    print(f"Questions Evaluated: {stats['evaluated_questions']}")
+if __name__ == "__main__":
+    main()
@@ -65,24 +65,37 @@ def hit_rate_at_k(results, k=5):
 # ROUGE Score (Answer Quality)
 # -------------------------
 
+def lcs_length(s1, s2):
+    """
+    Length of the longest common subsequence of two token lists.
+
+    Bit-parallel (Allison-Dix / Hyyro): bit i of each mask stands for
+    s1[i], so every token of s2 costs a few big-int operations instead
+    of a DP row.
+    """
+    if not s1 or not s2:
+        return 0
+
+    masks = {}
+    for i, token in enumerate(s1):
+        masks[token] = masks.get(token, 0) | (1 << i)
+
+    full = (1 << len(s1)) - 1
+    v = full
+
+    for token in s2:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+
+    # zero bits of v mark matched positions
+    return len(s1) - bin(v).count("1")
+
+
 def rouge_score(generated, reference):
     """
     Simple ROUGE-L implementation (longest common subsequence)
     Compares generated answer with reference answer
     """
-    def lcs_length(s1, s2):
-        m, n = len(s1), len(s2)
-        dp = [[0] * (n + 1) for _ in range(m + 1)]
-        
-        for i in range(1, m + 1):
-            for j in range(1, n + 1):
-                if s1[i-1] == s2[j-1]:
-                    dp[i][j] = dp[i-1][j-1] + 1
-                else:
-                    dp[i][j] = max(dp[i-1][j], dp[i][j-1])
-        
-        return dp[m][n]
-    
     gen_tokens = generated.lower().split()
     ref_tokens = reference.lower().split()
     
@@ -180,28 +193,51 @@ def compute_bleu_batch(results):
 # Semantic Similarity (Answer Quality)
 # -------------------------
 
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 256
+
+
+def get_embedding_model():
+    """SentenceTransformer shared by all similarity calls (and the RAG pipeline)"""
+    from src.model_registry import get_sentence_transformer
+
+    return get_sentence_transformer(EMBED_MODEL_NAME, device="cpu")
+
+
+def _pairwise_cosine(generated, reference):
+    """
+    Cosine similarity of generated[i] and reference[i] for all i.
+    Distinct texts are encoded once, in large batches.
+    Returns an array with NaN where either embedding is zero.
+    """
+    texts = list(dict.fromkeys(generated + reference))
+    index = {text: i for i, text in enumerate(texts)}
+
+    embeddings = np.asarray(
+        get_embedding_model().encode(
+            texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False, convert_to_tensor=False
+        ),
+        dtype="float32"
+    )
+
+    gen_emb = embeddings[[index[t] for t in generated]]
+    ref_emb = embeddings[[index[t] for t in reference]]
+
+    norms = np.linalg.norm(gen_emb, axis=1) * np.linalg.norm(ref_emb, axis=1)
+    dots = np.einsum("ij,ij->i", gen_emb, ref_emb)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(norms > 0, dots / norms, np.nan)
+
+
 def semantic_similarity(generated, reference):
     """
     Compute cosine similarity between generated and reference answers
     using sentence embeddings
     """
     try:
-        from sentence_transformers import SentenceTransformer
-        
-        model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
-        
-        gen_emb = model.encode(generated, convert_to_tensor=False)
-        ref_emb = model.encode(reference, convert_to_tensor=False)
-        
-        # Cosine similarity
-        dot_product = np.dot(gen_emb, ref_emb)
-        norm_gen = np.linalg.norm(gen_emb)
-        norm_ref = np.linalg.norm(ref_emb)
-        
-        if norm_gen * norm_ref == 0:
-            return 0.0
-        
-        return float(dot_product / (norm_gen * norm_ref))
+        score = _pairwise_cosine([generated], [reference])[0]
+        return 0.0 if np.isnan(score) else float(score)
     
     except Exception as e:
         print(f"Warning: Semantic similarity computation failed: {e}")
@@ -213,28 +249,20 @@ def compute_semantic_similarity_batch(results):
     Compute semantic similarity for batch of results
     """
     try:
-        from sentence_transformers import SentenceTransformer
-        
-        model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
-        sim_scores = []
-        
-        for item in results:
-            gen = item.get("generated_answer", "")
-            ref = item.get("ground_truth_answer", "")
-            
-            if gen and ref:
-                gen_emb = model.encode(gen, convert_to_tensor=False)
-                ref_emb = model.encode(ref, convert_to_tensor=False)
-                
-                dot_product = np.dot(gen_emb, ref_emb)
-                norm_gen = np.linalg.norm(gen_emb)
-                norm_ref = np.linalg.norm(ref_emb)
-                
-                if norm_gen * norm_ref > 0:
-                    sim_scores.append(float(dot_product / (norm_gen * norm_ref)))
-        
-        return np.mean(sim_scores) if sim_scores else 0.0
+        pairs = [
+            (item.get("generated_answer", ""), item.get("ground_truth_answer", ""))
+            for item in results
+        ]
+        pairs = [(gen, ref) for gen, ref in pairs if gen and ref]
+
+        if not pairs:
+            return 0.0
+
+        scores = _pairwise_cosine([gen for gen, _ in pairs], [ref for _, ref in pairs])
+        scores = scores[~np.isnan(scores)]
+
+        return float(np.mean(scores)) if len(scores) else 0.0
     
     except Exception as e:
         print(f"Warning: Batch semantic similarity failed: {e}")
-        return 0.0
\ No newline at end of file
+        return 0.0
@@ -8,42 +8,102 @@ Orchestrates all evaluation components:
 4. Advanced metrics (ROUGE, BLEU, Semantic Similarity)
 5. LLM-as-Judge evaluation
 6. Report generation (HTML + JSON)
+
+Steps run in this process as a dependency graph sharing one loaded
+RAG engine. A step whose inputs are unchanged since its last run is
+skipped (reports/pipeline_state.json); --force reruns everything.
 """
 
-import subprocess
+import argparse
+import hashlib
+import importlib
+import importlib.util
 import sys
 import os
 import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 
 # ======================================================
 # PIPELINE CONFIGURATION
 # ======================================================
 
+STATE_PATH = "reports/pipeline_state.json"
+
+# files the loaded RAG engine reads; steps using it rerun when they change
+ENGINE_INPUTS = [
+    "data/corpus_chunks.json",
+    "data/faiss.index",
+    "data/faiss.index.meta.json",
+    "data/faiss.index.ivfdata",
+    "data/sparse_index",
+    "src/rag_pipeline.py",
+    "src/sparse_index.py",
+    "src/dense_index.py",
+    "src/embedding_cache.py",
+    "src/response_cache.py",
+    "src/semantic_cache.py",
+    "src/batching.py",
+    "src/model_registry.py"
+]
+
+# the engine's settings come from these (RAGConfig.from_env)
+ENGINE_ENV_PREFIX = "RAG_"
+
+# Steps run in this process as module.main(). A step depends on every
+# step producing one of its inputs; independent steps run in parallel,
+# except that steps using the engine run one at a time (they measure
+# retrieval latency, which a concurrent step would distort).
+# A step is skipped while its inputs (and its own source) hash the same
+# as at its last successful run and its outputs exist; list the helper
+# modules a step imports among its inputs. Engine steps also rerun when
+# the RAG_* environment changes.
 PIPELINE_STEPS = [
     {
         "name": "Main Evaluation",
-        "script": "evaluation/eval_runner.py",
+        "module": "evaluation.eval_runner",
+        "argv": [],
+        "rerun_argv": ["--fresh"],  # inputs changed: drop the old checkpoint
         "description": "Run evaluation on all 3 modes (dense, sparse, hybrid)",
+        "inputs": ["data/eval_questions.json", "evaluation/metrics.py"] + ENGINE_INPUTS,
+        "outputs": ["data/eval_results.json", "data/eval_summary.json"],
+        "uses_engine": True,
         "enabled": True
     },
     {
         "name": "Ablation Studies",
-        "script": "evaluation/ablation.py",
+        "module": "evaluation.ablation",
         "description": "Compare different RRF k values and retrieval modes",
+        "inputs": ["data/eval_questions.json", "evaluation/sweep.py"] + ENGINE_INPUTS,
+        "outputs": ["data/ablation_results.json", "data/ablation_summary.json"],
+        "uses_engine": True,
         "enabled": True
     },
     {
         "name": "Error Analysis",
-        "script": "evaluation/error_analysis.py",
+        "module": "evaluation.error_analysis",
         "description": "Categorize failures by question type and error patterns",
+        "inputs": ["data/eval_results.json", "data/eval_questions.json"],
+        "outputs": ["data/error_analysis.json"],
         "enabled": True
     },
     {
         "name": "Report Generation",
-        "script": "evaluation/report_generator.py",
+        "module": "evaluation.report_generator",
         "description": "Generate HTML and JSON evaluation reports",
+        "inputs": [
+            "data/eval_summary.json",
+            "data/eval_results.json",
+            "data/ablation_summary.json",
+            "data/error_analysis.json",
+            "data/llm_judge_summary.json"
+        ],
+        "outputs": ["reports/evaluation_report.html", "reports/evaluation_report.json"],
         "enabled": True
     }
 ]
@@ -60,35 +120,227 @@ def print_header(text):
     print("="*70 + "\n")
 
 
-def run_step(step):
-    """Run a single pipeline step"""
+def hash_path(path):
+    """sha256 of a file, or of a directory's files; None if missing"""
+
+    if not os.path.exists(path):
+        return None
+
+    digest = hashlib.sha256()
+
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        files = [path]
+
+    for file_path in files:
+        digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+
+    return digest.hexdigest()
+
+
+def step_source(step):
+    return os.path.relpath(importlib.util.find_spec(step["module"]).origin)
+
+
+def environment_hash():
+    """sha256 of the RAG_* environment variables the engine is configured from"""
+
+    settings = sorted(
+        (name, value) for name, value in os.environ.items()
+        if name.startswith(ENGINE_ENV_PREFIX)
+    )
+
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+def input_hashes(step):
+    """Content hashes of a step's inputs, including its own source"""
+
+    hashes = {
+        path: hash_path(path)
+        for path in [step_source(step)] + step["inputs"]
+    }
+
+    if step.get("uses_engine"):
+        hashes[f"env:{ENGINE_ENV_PREFIX}*"] = environment_hash()
+
+    return hashes
+
+
+def load_state():
+
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    return {}
+
+
+def save_state(state):
+
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+_engine_lock = threading.Lock()
+
+
+def load_engine():
+    """
+    Load the shared engine's retrieval components once; every step
+    uses the same engine. The generator loads on first use, only if
+    a step generates answers.
+    """
+
+    with _engine_lock:
+        rag_pipeline = importlib.import_module("src.rag_pipeline")
+        return rag_pipeline.get_engine().load(
+            "corpus", "sparse", "dense", "embedder", "query_cache", "response_cache"
+        )
+
+
+def run_step(step, argv=None):
+    """Run a single pipeline step in this process"""
     print_header(step["name"])
     print(f"📌 {step['description']}\n")
-    
+
     try:
-        # Run the script
-        result = subprocess.run(
-            [sys.executable, step["script"]],
-            cwd=os.path.dirname(os.path.abspath(__file__)) or ".",
-            capture_output=False,
-            text=True
-        )
-        
-        if result.returncode == 0:
-            print(f"\n✅ {step['name']} completed successfully")
-            return True
-        else:
-            print(f"\n❌ {step['name']} failed with return code {result.returncode}")
+        if step.get("uses_engine"):
+            load_engine()
+
+        module = importlib.import_module(step["module"])
+
+        code = module.main(argv) if argv is not None else module.main()
+
+        if code:
+            print(f"\n❌ {step['name']} failed with return code {code}")
             return False
-    
+
+        print(f"\n✅ {step['name']} completed successfully")
+        return True
+
+    except SystemExit as e:
+        if e.code:
+            print(f"\n❌ {step['name']} exited with code {e.code}")
+            return False
+        print(f"\n✅ {step['name']} completed successfully")
+        return True
+
     except Exception as e:
+        traceback.print_exc()
         print(f"\n❌ Error running {step['name']}: {e}")
         return False
 
 
+def step_dependencies(steps):
+    """name -> names of the steps producing its inputs"""
+
+    producers = {
+        output: step["name"] for step in steps for output in step["outputs"]
+    }
+
+    return {
+        step["name"]: {
+            producers[path] for path in step["inputs"]
+            if path in producers and producers[path] != step["name"]
+        }
+        for step in steps
+    }
+
+
+def run_pipeline(steps, force=False, jobs=2):
+    """
+    Run steps in dependency order, up to jobs at a time, at most one
+    of them using the engine. Returns {name: "success" | "failed" | "up_to_date" | "blocked"}.
+    """
+
+    dependencies = step_dependencies(steps)
+    by_name = {step["name"]: step for step in steps}
+
+    state = load_state()
+    state_lock = threading.Lock()
+
+    status = {}
+    running = {}
+
+    def execute(step):
+
+        hashes = input_hashes(step)
+        previous = state.get(step["name"])
+
+        if (not force and previous and previous.get("inputs") == hashes
+                and all(os.path.exists(path) for path in step["outputs"])):
+            print(f"⏭️  Up to date: {step['name']}")
+            return "up_to_date"
+
+        argv = step.get("argv")
+        if "rerun_argv" in step and (force or (previous and previous["inputs"] != hashes)):
+            argv = step["rerun_argv"]
+
+        if not run_step(step, argv):
+            return "failed"
+
+        with state_lock:
+            state[step["name"]] = {
+                "inputs": hashes,
+                "finished_at": datetime.now().isoformat()
+            }
+            save_state(state)
+
+        return "success"
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+
+        while len(status) < len(steps):
+
+            for name, deps in dependencies.items():
+
+                if name in status or name in running:
+                    continue
+
+                if any(status.get(dep) in ("failed", "blocked") for dep in deps):
+                    print(f"⏭️  Skipping {name}: a dependency failed")
+                    status[name] = "blocked"
+
+                elif all(dep in status for dep in deps):
+
+                    # wait for the running engine step to finish
+                    if by_name[name].get("uses_engine") and any(
+                        by_name[other].get("uses_engine") for other in running
+                    ):
+                        continue
+
+                    running[name] = executor.submit(execute, by_name[name])
+
+            if not running:
+                continue
+
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+
+            for name, future in list(running.items()):
+                if future in done:
+                    status[name] = future.result()
+                    del running[name]
+
+    return status
+
+
 def generate_pipeline_report(results):
     """Generate pipeline execution report"""
-    
+
+    from src.model_registry import stats as model_stats
+
     report = {
         "metadata": {
             "executed_at": datetime.now().isoformat(),
@@ -96,10 +348,13 @@ def generate_pipeline_report(results):
             "cwd": os.getcwd()
         },
         "pipeline_steps": results,
+        # models shared by all steps (one copy each)
+        "models": model_stats(),
         "summary": {
             "total_steps": len(results),
             "successful": sum(1 for r in results if r["status"] == "success"),
-            "failed": sum(1 for r in results if r["status"] == "failed")
+            "up_to_date": sum(1 for r in results if r["status"] == "up_to_date"),
+            "failed": sum(1 for r in results if r["status"] in ("failed", "blocked"))
         }
     }
     
@@ -110,9 +365,14 @@ def generate_pipeline_report(results):
 # MAIN PIPELINE EXECUTION
 # ======================================================
 
-def main():
+def main(argv=None):
     """Execute the full evaluation pipeline"""
-    
+
+    parser = argparse.ArgumentParser(description="Run the evaluation pipeline")
+    parser.add_argument("--force", action="store_true", help="rerun every step")
+    parser.add_argument("--jobs", type=int, default=2, help="steps to run in parallel")
+    args = parser.parse_args(argv)
+
     print("\n")
     print("╔" + "="*68 + "╗")
     print("║" + " "*68 + "║")
@@ -127,21 +387,23 @@ def main():
         print("   Please run: python evaluation/question_generator.py")
         return 1
     
-    results = []
-    
-    # Run enabled pipeline steps
     for step in PIPELINE_STEPS:
         if not step["enabled"]:
             print(f"⏭️  Skipping: {step['name']}")
-            continue
-        
-        success = run_step(step)
-        
-        results.append({
+
+    steps = [step for step in PIPELINE_STEPS if step["enabled"]]
+
+    # Run enabled pipeline steps
+    status = run_pipeline(steps, force=args.force, jobs=args.jobs)
+
+    results = [
+        {
             "name": step["name"],
-            "script": step["script"],
-            "status": "success" if success else "failed"
-        })
+            "module": step["module"],
+            "status": status[step["name"]]
+        }
+        for step in steps
+    ]
     
     # Generate pipeline report
     print_header("Pipeline Execution Complete")
@@ -151,7 +413,14 @@ def main():
     print("📊 Pipeline Summary:")
     print(f"   • Total Steps: {pipeline_report['summary']['total_steps']}")
     print(f"   • ✅ Successful: {pipeline_report['summary']['successful']}")
+    print(f"   • ⏭️  Up to date: {pipeline_report['summary']['up_to_date']}")
     print(f"   • ❌ Failed: {pipeline_report['summary']['failed']}")
+
+    if pipeline_report["models"]:
+        print("\n🧠 Models loaded:")
+        for m in pipeline_report["models"]:
+            print(f"   • {m['name']} ({m['device']}, {m['dtype']}): "
+                  f"{m['load_time_sec']}s, {m['memory_mb']} MB, {m['requests']} requests")
     
     # Save pipeline report
     os.makedirs("reports", exist_ok=True)
@@ -9,43 +9,48 @@ os.environ["MKL_NUM_THREADS"] = "1"
 import torch
 torch.set_num_threads(1)
 
+import argparse
 import json
 import random
+import re
+import sys
+from multiprocessing import Pool
 from tqdm import tqdm
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.model_registry import get_seq2seq
 
 
 # ---------- MODEL ----------
 MODEL_NAME = "google/flan-t5-small"
 
-print("Loading model...")
+tokenizer = None
+model = None
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
 
-model.to("cpu")
-model.eval()
+def load_model():
+    """Load the generator once per process."""
 
+    global tokenizer, model
 
-# ---------- PATHS ----------
-CORPUS_PATH = "data/corpus_chunks.json"
-OUTPUT_PATH = "data/eval_questions.json"
-
-NUM_QUESTIONS = 100
+    if model is not None:
+        return
 
+    print("Loading model...")
 
-# ---------- LOAD CORPUS ----------
-print("\nLoading corpus...")
+    tokenizer, model = get_seq2seq(MODEL_NAME, device="cpu")
 
-with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-    corpus = json.load(f)
 
-random.shuffle(corpus)
-
-print("Generating evaluation questions...\n")
+# ---------- PATHS ----------
+CORPUS_PATH = "data/corpus_chunks.json"
+OUTPUT_PATH = "data/eval_questions.json"
 
+# every processed chunk (accepted or not) is appended here, so an
+# interrupted run resumes where it stopped
+CHECKPOINT_PATH = "data/eval_questions.jsonl"
 
-results = []
+NUM_QUESTIONS = 100
 
 
 # ---------- SIMPLE PROMPTS ----------
@@ -64,78 +69,223 @@ ANSWER_PROMPT = (
 )
 
 
-# ---------- MAIN LOOP ----------
-
-for item in tqdm(corpus):
-
-    if len(results) >= NUM_QUESTIONS:
-        break
+# ---------- BATCHED GENERATION ----------
 
-    context = item["text"][:300]
-    url = item["url"]
+def _generate(prompts, max_new_tokens):
+    """One padded generate call for a list of prompts."""
 
-    # ----- Generate Question -----
-    q_prompt = QUESTION_PROMPT.format(context=context)
-
-    q_inputs = tokenizer(
-        q_prompt,
+    inputs = tokenizer(
+        prompts,
         return_tensors="pt",
+        padding=True,
         truncation=True,
         max_length=512
     )
 
     with torch.no_grad():
-        q_outputs = model.generate(
-            q_inputs["input_ids"],
-            max_new_tokens=50,
+        outputs = model.generate(
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_new_tokens=max_new_tokens,
             do_sample=False
         )
 
-    question = tokenizer.decode(q_outputs[0], skip_special_tokens=True).strip()
+    return [
+        text.strip()
+        for text in tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    ]
 
-    # If model outputs statement — force it into question
-    if not question.endswith("?"):
-        question = question + "?"
 
-    if len(question) < 12:
-        continue
+def generate_batch(chunks):
+    """
+    chunks: list of (chunk_id, context, url).
+    Returns one record per chunk; "question" / "answer" are None
+    when the chunk was rejected.
+    """
 
+    records = [
+        {"chunk_id": chunk_id, "source_url": url, "question": None, "answer": None}
+        for chunk_id, _, url in chunks
+    ]
 
-    # ----- Generate Answer -----
-    a_prompt = ANSWER_PROMPT.format(
-        context=context,
-        question=question
+    # ----- Generate Questions -----
+    questions = _generate(
+        [QUESTION_PROMPT.format(context=context) for _, context, _ in chunks],
+        max_new_tokens=50
     )
 
-    a_inputs = tokenizer(
-        a_prompt,
-        return_tensors="pt",
-        truncation=True,
-        max_length=512
+    keep = []
+
+    for i, question in enumerate(questions):
+
+        # If model outputs statement — force it into question
+        if not question.endswith("?"):
+            question = question + "?"
+
+        if len(question) >= 12:
+            records[i]["question"] = question
+            keep.append(i)
+
+    if not keep:
+        return records
+
+    # ----- Generate Answers (only for kept questions) -----
+    answers = _generate(
+        [
+            ANSWER_PROMPT.format(context=chunks[i][1], question=records[i]["question"])
+            for i in keep
+        ],
+        max_new_tokens=80
     )
 
-    with torch.no_grad():
-        a_outputs = model.generate(
-            a_inputs["input_ids"],
-            max_new_tokens=80,
-            do_sample=False
-        )
+    for i, answer in zip(keep, answers):
+        if len(answer) >= 12:
+            records[i]["answer"] = answer
+
+    return records
+
+
+def normalize_question(question):
+    """Key for duplicate detection: lowercase words, no punctuation."""
+
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+# ---------- CHECKPOINT ----------
+
+def load_checkpoint(path):
+    """Records from earlier runs; skips a torn last line."""
+
+    records = []
+
+    if not os.path.exists(path):
+        return records
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+
+    # rewrite without the torn line so appends start cleanly
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in records))
+
+    return records
+
+
+# ---------- MAIN LOOP ----------
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Generate evaluation questions from the corpus")
+    parser.add_argument("--num-questions", type=int, default=NUM_QUESTIONS)
+    parser.add_argument("--batch-size", type=int, default=32, help="chunks per generate call")
+    parser.add_argument("--workers", type=int, default=1, help="processes, each loading the model")
+    parser.add_argument("--seed", type=int, default=42, help="corpus shuffle seed")
+    parser.add_argument("--fresh", action="store_true", help="discard the checkpoint")
+    args = parser.parse_args(argv)
+
+    print("\nLoading corpus...")
+
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    if args.fresh and os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+    records = load_checkpoint(CHECKPOINT_PATH)
+
+    done_chunks = {r["chunk_id"] for r in records}
+    seen = set()
+    results = []
+
+    for r in records:
+        if r.get("accepted"):
+            seen.add(normalize_question(r["question"]))
+            results.append(r)
+
+    order = list(range(len(corpus)))
+    random.Random(args.seed).shuffle(order)
+
+    pending = [
+        (i, corpus[i]["text"][:300], corpus[i]["url"])
+        for i in order if i not in done_chunks
+    ]
+    batches = [
+        pending[start:start + args.batch_size]
+        for start in range(0, len(pending), args.batch_size)
+    ]
+
+    print(f"Resuming with {len(results)} questions from {len(done_chunks)} processed chunks")
+    print("Generating evaluation questions...\n")
+
+    pool = None
+
+    if len(results) < args.num_questions and batches:
+
+        if args.workers > 1:
+            pool = Pool(args.workers, initializer=load_model)
+
+        try:
+            if pool is not None:
+                batch_results = pool.imap(generate_batch, batches)
+            else:
+                load_model()
+                batch_results = map(generate_batch, batches)
+
+            progress = tqdm(total=args.num_questions, initial=len(results))
+
+            with open(CHECKPOINT_PATH, "a", encoding="utf-8") as out:
+
+                for batch in batch_results:
+
+                    processed = []
+
+                    for record in batch:
+
+                        # records past the limit are not checkpointed, so a
+                        # later run with a larger --num-questions uses them
+                        if len(results) >= args.num_questions:
+                            break
+
+                        key = normalize_question(record["question"] or "")
+                        record["accepted"] = bool(
+                            record["question"] and record["answer"] and key not in seen
+                        )
+
+                        if record["accepted"]:
+                            seen.add(key)
+                            results.append(record)
+                            progress.update(1)
+
+                        processed.append(record)
+
+                    out.write("".join(json.dumps(r) + "\n" for r in processed))
+                    out.flush()
+
+                    if len(results) >= args.num_questions:
+                        break
 
-    answer = tokenizer.decode(a_outputs[0], skip_special_tokens=True).strip()
+            progress.close()
 
-    if len(answer) < 12:
-        continue
+        finally:
+            # also on errors and Ctrl-C, so no worker outlives the run
+            if pool is not None:
+                pool.terminate()
 
+    # ---------- SAVE ----------
+    questions = [
+        {"question": r["question"], "answer": r["answer"], "source_url": r["source_url"]}
+        for r in results[:args.num_questions]
+    ]
 
-    results.append({
-        "question": question,
-        "answer": answer,
-        "source_url": url
-    })
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(questions, f, indent=2)
 
+    print("\nSaved", len(questions), "questions to", OUTPUT_PATH)
 
-# ---------- SAVE ----------
-with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(results, f, indent=2)
 
-print("\nSaved", len(results), "questions to", OUTPUT_PATH)
+if __name__ == "__main__":
+    main()
@@ -27,11 +27,19 @@ def load_json_safe(path):
     return {}
 
 
-eval_summary = load_json_safe(os.path.join(DATA_DIR, "eval_summary.json"))
-eval_results = load_json_safe(os.path.join(DATA_DIR, "eval_results.json")) or []
-ablation_summary = load_json_safe(os.path.join(DATA_DIR, "ablation_summary.json"))
-error_analysis = load_json_safe(os.path.join(DATA_DIR, "error_analysis.json"))
-llm_judge_summary = load_json_safe(os.path.join(DATA_DIR, "llm_judge_summary.json"))
+def load_data():
+    """(Re)load the evaluation outputs the reports are built from"""
+
+    global eval_summary, eval_results, ablation_summary, error_analysis, llm_judge_summary
+
+    eval_summary = load_json_safe(os.path.join(DATA_DIR, "eval_summary.json"))
+    eval_results = load_json_safe(os.path.join(DATA_DIR, "eval_results.json")) or []
+    ablation_summary = load_json_safe(os.path.join(DATA_DIR, "ablation_summary.json"))
+    error_analysis = load_json_safe(os.path.join(DATA_DIR, "error_analysis.json"))
+    llm_judge_summary = load_json_safe(os.path.join(DATA_DIR, "llm_judge_summary.json"))
+
+
+load_data()
 
 
 # ======================================================
@@ -546,9 +554,11 @@ def generate_json_report():
 # MAIN EXECUTION
 # ======================================================
 
-if __name__ == "__main__":
+def main():
     print("Generating comprehensive evaluation reports...")
-    
+
+    load_data()
+
     html_report = generate_html_report()
     json_report = generate_json_report()
     
@@ -557,3 +567,7 @@ if __name__ == "__main__":
     print("="*60)
     print(f"\nHTML Report: {html_report}")
     print(f"JSON Report: {json_report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Sparse Retrieval Benchmark: exhaustive postings scoring vs. block-max
+MaxScore pruning on the same queries. Reports postings touched and
+latency, and checks that both return identical top-k results.
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.sparse_index import SparseIndex
+
+
+# ======================================================
+# CONFIGURATION
+# ======================================================
+
+CORPUS_PATH = "data/corpus_chunks.json"
+QUESTIONS_PATH = "data/eval_questions.json"
+BENCHMARK_PATH = "data/sparse_benchmark.json"
+
+TOP_K_VALUES = [5, 10, 20]
+REPEATS = 3
+
+
+# ======================================================
+# LOAD CORPUS AND QUERIES
+# ======================================================
+
+with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+    corpus = json.load(f)
+
+with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+    queries = [q["question"].split() for q in json.load(f)]
+
+start = time.time()
+index = SparseIndex.build([d["text"].split() for d in corpus])
+build_time = round(time.time() - start, 3)
+
+print(f"Indexed {index.corpus_size} chunks in {build_time}s")
+print(f"Benchmarking {len(queries)} queries")
+
+
+# ======================================================
+# RUN BENCHMARK
+# ======================================================
+
+def run(query_tokens, k, prune):
+    """Best-of-REPEATS latency (ms), results and postings touched."""
+
+    best = float("inf")
+
+    for _ in range(REPEATS):
+        stats = {}
+        t0 = time.perf_counter()
+        results = index.top_k(query_tokens, k, prune=prune, stats=stats)
+        best = min(best, (time.perf_counter() - t0) * 1000)
+
+    return best, results, stats
+
+
+benchmark = {
+    "corpus_size": index.corpus_size,
+    "num_queries": len(queries),
+    "block_size": index.block_size,
+    "build_time_sec": build_time,
+    "results": {}
+}
+
+for k in TOP_K_VALUES:
+
+    rows = {"exhaustive": {"latency": [], "postings": []},
+            "pruned": {"latency": [], "postings": []}}
+    mismatches = 0
+
+    for query_tokens in queries:
+
+        ex_ms, ex_results, ex_stats = run(query_tokens, k, prune=False)
+        pr_ms, pr_results, pr_stats = run(query_tokens, k, prune=True)
+
+        if ex_results != pr_results:
+            mismatches += 1
+
+        rows["exhaustive"]["latency"].append(ex_ms)
+        rows["exhaustive"]["postings"].append(ex_stats["postings_touched"])
+        rows["pruned"]["latency"].append(pr_ms)
+        rows["pruned"]["postings"].append(pr_stats["postings_touched"])
+
+    summary = {"mismatched_queries": mismatches}
+
+    for method, values in rows.items():
+        latency = np.array(values["latency"])
+        summary[method] = {
+            "avg_latency_ms": round(float(latency.mean()), 3),
+            "p50_latency_ms": round(float(np.percentile(latency, 50)), 3),
+            "p95_latency_ms": round(float(np.percentile(latency, 95)), 3),
+            "avg_postings_touched": round(float(np.mean(values["postings"])), 1)
+        }
+
+    benchmark["results"][f"top_{k}"] = summary
+
+    ex, pr = summary["exhaustive"], summary["pruned"]
+    print(f"\nTOP-{k}")
+    print(f"  Exhaustive: {ex['avg_latency_ms']} ms avg | {ex['avg_postings_touched']} postings")
+    print(f"  Pruned:     {pr['avg_latency_ms']} ms avg | {pr['avg_postings_touched']} postings")
+    print(f"  Identical results: {len(queries) - mismatches}/{len(queries)}")
+
+
+# ======================================================
+# SAVE RESULTS
+# ======================================================
+
+with open(BENCHMARK_PATH, "w", encoding="utf-8") as f:
+    json.dump(benchmark, f, indent=2)
+
+print(f"\nSaved sparse benchmark → {BENCHMARK_PATH}")
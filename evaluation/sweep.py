@@ -0,0 +1,281 @@
+"""
+Ablation Sweep Engine: retrieve dense and sparse candidates once per
+question at the largest top_k, then score every (mode, top_k, final_k,
+rrf_k) configuration from those rankings with array operations.
+
+Truncating the deepest ranking to top_k gives the same list as
+retrieving with top_k (exact for the flat index and BM25, approximate
+for IVF / HNSW), and fusion reproduces rrf_fusion's scores and tie
+order, so the grid matches what run_rag would return per config.
+"""
+
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.rag_pipeline import run_rag_modes, RRF_K
+
+
+# ======================================================
+# CONFIGURATION
+# ======================================================
+
+QUESTIONS_PATH = "data/eval_questions.json"
+SWEEP_RESULTS_PATH = "data/sweep_results.json"
+
+MODES = ["dense", "sparse", "hybrid"]
+TOP_K_VALUES = [3, 5, 10, 15, 20, 30, 50]
+FINAL_K_VALUES = [1, 3, 5, 10]
+RRF_K_VALUES = [1, 5, 10, 20, 30, 45, 60, 80, 100, 150, 200, 500]
+
+RECALL_K = 5
+
+# stage latency that a mode's retrieval costs
+MODE_STAGE = {"dense": "dense", "sparse": "sparse", "hybrid": "retrieval"}
+
+
+# ======================================================
+# CANDIDATE COLLECTION (one retrieval per question)
+# ======================================================
+
+def collect_candidates(questions, max_top_k, nprobe=None, ef_search=None):
+    """
+    One hybrid retrieval per question at depth max_top_k, always run
+    (not served from the retrieval cache) so the latencies are measured.
+
+    Each question's candidate pool lists its dense results first,
+    then sparse-only ones (rrf_fusion's insertion order). Returns
+    (n_questions, 2 * max_top_k) arrays:
+      dense_rank / sparse_rank: 0-based rank, max_top_k if absent
+      is_gt: the candidate's URL is the ground-truth URL
+    and "timings": per-question stage latencies in seconds.
+    """
+
+    n, width = len(questions), 2 * max_top_k
+
+    dense_rank = np.full((n, width), max_top_k, dtype=np.int64)
+    sparse_rank = np.full((n, width), max_top_k, dtype=np.int64)
+    is_gt = np.zeros((n, width), dtype=bool)
+
+    timings = {stage: [] for stage in ("dense", "sparse", "fusion", "retrieval")}
+
+    for qi, item in enumerate(tqdm(questions)):
+
+        result = run_rag_modes(
+            item["question"],
+            modes=("hybrid",),
+            top_k=max_top_k,
+            final_k=max_top_k,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            generate=False
+        )["hybrid"]
+
+        slots = {}
+
+        for ranks, results in ((dense_rank, result.get("dense_results", [])),
+                               (sparse_rank, result.get("sparse_results", []))):
+
+            for rank, r in enumerate(results):
+                slot = slots.setdefault(r["chunk_id"], len(slots))
+                ranks[qi, slot] = rank
+                is_gt[qi, slot] = r["url"] == item["source_url"]
+
+        for stage, values in timings.items():
+            values.append(result.get("timings", {}).get(stage, 0.0))
+
+    return {
+        "max_top_k": max_top_k,
+        "dense_rank": dense_rank,
+        "sparse_rank": sparse_rank,
+        "is_gt": is_gt,
+        "timings": {stage: np.array(values) for stage, values in timings.items()}
+    }
+
+
+# ======================================================
+# VECTORIZED SCORING
+# ======================================================
+
+def _first_hit_single(ranks, is_gt):
+    """0-based position of the first ground-truth hit per question."""
+
+    return np.where(is_gt, ranks, np.iinfo(np.int64).max).min(axis=1)
+
+
+def _first_hit_hybrid(candidates, top_k_values, rrf_k_values):
+    """
+    First ground-truth position in the fused ranking for every
+    (top_k, rrf_k) pair -> (n_top_k, n_rrf_k, n_questions).
+    """
+
+    top_k = np.asarray(top_k_values)[:, None, None, None]
+    rrf_k = np.asarray(rrf_k_values)[None, :, None, None]
+
+    dense = candidates["dense_rank"][None, None]
+    sparse = candidates["sparse_rank"][None, None]
+
+    # same terms (and float sums) as rrf_fusion; 0 = not retrieved
+    scores = (
+        np.where(dense < top_k, 1 / (rrf_k + dense + 1), 0.0) +
+        np.where(sparse < top_k, 1 / (rrf_k + sparse + 1), 0.0)
+    )
+
+    # stable sort keeps insertion order for ties, like sorted()
+    order = np.argsort(-scores, axis=-1, kind="stable")
+
+    hits = np.take_along_axis(
+        np.broadcast_to(candidates["is_gt"], scores.shape) & (scores > 0),
+        order, axis=-1
+    )
+
+    return np.where(hits.any(axis=-1), hits.argmax(axis=-1), np.iinfo(np.int64).max)
+
+
+def grid_configs(modes=MODES, top_k_values=TOP_K_VALUES,
+                 final_k_values=FINAL_K_VALUES, rrf_k_values=RRF_K_VALUES):
+    """Every combination; rrf_k only varies for hybrid."""
+
+    configs = []
+
+    for mode, top_k, final_k in itertools.product(modes, top_k_values, final_k_values):
+
+        for rrf_k in (rrf_k_values if mode == "hybrid" else [None]):
+
+            name = f"{mode}_top{top_k}_final{final_k}"
+            if rrf_k is not None:
+                name += f"_rrf{rrf_k}"
+
+            configs.append({
+                "name": name, "mode": mode,
+                "top_k": top_k, "final_k": final_k, "rrf_k": rrf_k
+            })
+
+    return configs
+
+
+def _rrf_k(config):
+
+    return RRF_K if config.get("rrf_k") is None else config["rrf_k"]
+
+
+def evaluate_configs(candidates, configs):
+    """
+    MRR / Recall@5 for each config dict (mode, top_k, final_k and,
+    for hybrid, rrf_k - default RRF_K), in order. Each row also gets
+    per-question "ranks" (1-based, None = missed) and the average
+    latency of the mode's stages from the shared retrieval pass.
+    """
+
+    max_top_k = candidates["max_top_k"]
+
+    for config in configs:
+        if config["top_k"] > max_top_k:
+            raise ValueError(
+                f"{config.get('name', config)}: top_k {config['top_k']} "
+                f"exceeds collected depth {max_top_k}"
+            )
+
+    first_hit = {
+        "dense": _first_hit_single(candidates["dense_rank"], candidates["is_gt"]),
+        "sparse": _first_hit_single(candidates["sparse_rank"], candidates["is_gt"])
+    }
+
+    hybrid = [c for c in configs if c["mode"] == "hybrid"]
+
+    if hybrid:
+
+        top_k_values = sorted({c["top_k"] for c in hybrid})
+        rrf_k_values = sorted({_rrf_k(c) for c in hybrid})
+
+        fused = _first_hit_hybrid(candidates, top_k_values, rrf_k_values)
+
+        for c in hybrid:
+            first_hit[("hybrid", c["top_k"], _rrf_k(c))] = fused[
+                top_k_values.index(c["top_k"]),
+                rrf_k_values.index(_rrf_k(c))
+            ]
+
+    rows = []
+
+    for config in configs:
+
+        if config["mode"] == "hybrid":
+            position = first_hit[("hybrid", config["top_k"], _rrf_k(config))]
+            depth = config["final_k"]
+        else:
+            position = first_hit[config["mode"]]
+            depth = min(config["top_k"], config["final_k"])
+
+        found = position < depth
+        rr = np.where(found, 1 / (np.minimum(position, depth) + 1), 0.0)
+
+        rows.append({
+            **config,
+            "MRR": round(float(rr.mean()), 4),
+            "Recall@5": round(float((position < min(depth, RECALL_K)).mean()), 4),
+            "Average_Latency": round(
+                float(candidates["timings"][MODE_STAGE[config["mode"]]].mean()), 3
+            ),
+            "ranks": [int(p) + 1 if f else None for p, f in zip(position, found)]
+        })
+
+    return rows
+
+
+# ======================================================
+# MAIN
+# ======================================================
+
+def main():
+
+    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    configs = grid_configs()
+    max_top_k = max(c["top_k"] for c in configs)
+
+    print(f"Loaded {len(questions)} evaluation questions")
+    print(f"Sweeping {len(configs)} configurations (retrieval depth {max_top_k})")
+
+    start = time.time()
+    candidates = collect_candidates(questions, max_top_k)
+    retrieval_time = round(time.time() - start, 3)
+
+    start = time.time()
+    rows = evaluate_configs(candidates, configs)
+    sweep_time = round(time.time() - start, 3)
+
+    print(f"Retrieval: {retrieval_time}s | Grid scoring: {sweep_time}s")
+
+    os.makedirs("data", exist_ok=True)
+
+    with open(SWEEP_RESULTS_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "num_questions": len(questions),
+            "num_configs": len(configs),
+            "max_top_k": max_top_k,
+            "retrieval_time_sec": retrieval_time,
+            "sweep_time_sec": sweep_time,
+            "configs": [{k: v for k, v in r.items() if k != "ranks"} for r in rows]
+        }, f, indent=2)
+
+    print(f"Saved sweep results → {SWEEP_RESULTS_PATH}")
+
+    print(f"\n{'='*60}")
+    print("TOP CONFIGURATIONS BY MRR")
+    print(f"{'='*60}")
+
+    for row in sorted(rows, key=lambda r: (-r["MRR"], -r["Recall@5"]))[:10]:
+        print(f"{row['name']:<32} MRR: {row['MRR']:<8} Recall@5: {row['Recall@5']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+# recent batches / items kept for the percentiles in stats()
+STATS_WINDOW = 1000
+
+
+# ======================================================
+# ---------------- DYNAMIC MICRO-BATCHING --------------
+# ======================================================
+
+class MicroBatcher:
+    """
+    Groups single-item calls from concurrent callers into batched calls
+    of process_batch(items) -> results (one result per item, in order).
+
+    A batch starts as soon as max_batch_size items are waiting, or when
+    the oldest waiting item has waited max_wait seconds; items arriving
+    while a batch runs make up the next one. One background thread runs
+    the batches, so process_batch never runs concurrently with itself.
+
+    submit() returns a concurrent.futures.Future (sync callers: .result(),
+    asyncio callers: submit_async()). If process_batch raises, every
+    item of that batch gets the exception.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait=0.01, name="micro-batcher"):
+
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+
+        # (item, future, submitted_at), oldest first
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._busy_time = 0.0
+        self._first_submit = None
+        self._last_done = None
+        self._batch_sizes = deque(maxlen=STATS_WINDOW)
+        self._queue_waits = deque(maxlen=STATS_WINDOW)
+        self._latencies = deque(maxlen=STATS_WINDOW)
+
+    # --------------------------------------------------
+    # SUBMIT
+    # --------------------------------------------------
+
+    def submit(self, item):
+        """Queue one item -> Future of its result."""
+
+        future = Future()
+
+        with self._cond:
+
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+            now = time.perf_counter()
+
+            if self._first_submit is None:
+                self._first_submit = now
+
+            self._queue.append((item, future, now))
+            self._cond.notify()
+
+        return future
+
+    def __call__(self, item):
+        """Blocking submit: the item's result."""
+
+        return self.submit(item).result()
+
+    def map(self, items):
+        """Results for several items; they may share batches with other callers."""
+
+        futures = [self.submit(item) for item in items]
+
+        return [future.result() for future in futures]
+
+    async def submit_async(self, item):
+        """submit() for asyncio callers; the event loop is not blocked."""
+
+        return await asyncio.wrap_future(self.submit(item))
+
+    # --------------------------------------------------
+    # BATCH LOOP
+    # --------------------------------------------------
+
+    def _next_batch(self):
+        """Wait for the next batch; None once closed and drained."""
+
+        with self._cond:
+
+            while not self._queue and not self._closed:
+                self._cond.wait()
+
+            if not self._queue:
+                return None
+
+            deadline = self._queue[0][2] + self.max_wait
+
+            while len(self._queue) < self.max_batch_size and not self._closed:
+
+                remaining = deadline - time.perf_counter()
+
+                if remaining <= 0:
+                    break
+
+                self._cond.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch_size)
+
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+
+        while True:
+
+            batch = self._next_batch()
+
+            if batch is None:
+                return
+
+            # callers may have cancelled their futures while waiting
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            failed = False
+
+            try:
+                results = list(self.process_batch([item for item, _, _ in batch]))
+
+                if len(results) != len(batch):
+                    raise ValueError(
+                        f"{self.name}: process_batch returned {len(results)} results "
+                        f"for {len(batch)} items"
+                    )
+
+            except Exception as exc:
+                failed = True
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+
+            end = time.perf_counter()
+
+            with self._cond:
+
+                self._batches += 1
+                self._items += len(batch)
+                self._errors += failed
+                self._busy_time += end - start
+                self._last_done = end
+                self._batch_sizes.append(len(batch))
+
+                for _, _, submitted_at in batch:
+                    self._queue_waits.append(start - submitted_at)
+                    self._latencies.append(end - submitted_at)
+
+    def close(self):
+        """Finish the queued items, then stop the batch thread."""
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join()
+
+    # --------------------------------------------------
+    # STATS
+    # --------------------------------------------------
+
+    def stats(self):
+        """
+        Batch sizes, throughput (items per second of wall time since
+        the first submit, and per second of processing), and queueing /
+        end-to-end latency percentiles in milliseconds.
+        """
+
+        with self._cond:
+
+            elapsed = (self._last_done or 0.0) - (self._first_submit or 0.0)
+            sizes = list(self._batch_sizes)
+            queue_waits = sorted(self._queue_waits)
+            latencies = sorted(self._latencies)
+
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "batches": self._batches,
+                "items": self._items,
+                "failed_batches": self._errors,
+                "pending": len(self._queue),
+                "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                "throughput_per_sec": round(self._items / elapsed, 2) if elapsed > 0 else 0.0,
+                "busy_throughput_per_sec": (
+                    round(self._items / self._busy_time, 2) if self._busy_time > 0 else 0.0
+                ),
+                "queue_wait_ms_p50": _percentile_ms(queue_waits, 50),
+                "queue_wait_ms_p95": _percentile_ms(queue_waits, 95),
+                "latency_ms_p50": _percentile_ms(latencies, 50),
+                "latency_ms_p95": _percentile_ms(latencies, 95)
+            }
+
+
+def _percentile_ms(sorted_values, q):
+
+    if not sorted_values:
+        return None
+
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+
+    return round(sorted_values[index] * 1000, 2)
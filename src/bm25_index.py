@@ -1,14 +1,22 @@
-import json, pickle
-from rank_bm25 import BM25Okapi
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+from src.sparse_index import SparseIndex, corpus_fingerprint
+
+SPARSE_INDEX_PATH = "data/sparse_index"
 
 with open("data/corpus_chunks.json") as f:
     data = json.load(f)
 
-corpus = [d["text"].split() for d in data]
+texts = [d["text"] for d in data]
+corpus = [t.split() for t in texts]
 
-bm25 = BM25Okapi(corpus)
+bm25 = SparseIndex.build(corpus)
 
-with open("data/bm25.pkl", "wb") as f:
-    pickle.dump(bm25, f)
+# flat .npy arrays + meta.json, memory-mapped by rag_pipeline.py;
+# the fingerprint lets it detect a re-ingested corpus
+meta = bm25.save(SPARSE_INDEX_PATH, corpus_fingerprint=corpus_fingerprint(texts))
 
-print("BM25 index created")
+print(f"BM25 index created: {meta['num_terms']} terms, {meta['num_postings']} postings")
+print("Saved to", SPARSE_INDEX_PATH)
@@ -0,0 +1,302 @@
+import json
+import os
+from datetime import datetime
+
+import faiss
+import numpy as np
+from faiss.contrib.ondisk import merge_ondisk
+
+
+# ======================================================
+# ---------------- INDEX TYPES -------------------------
+# ======================================================
+
+# Build-time defaults for every supported index type.
+# Search-time knobs (nprobe / ef_search) are recorded too so
+# run_rag can fall back to them when the caller does not pass any.
+
+INDEX_DEFAULTS = {
+    "flat": {},
+    "ivf_flat": {"nlist": 256, "nprobe": 8},
+    "ivf_pq": {"nlist": 256, "m": 16, "nbits": 8, "nprobe": 8},
+    "hnsw": {"M": 32, "ef_construction": 200, "ef_search": 64},
+}
+
+META_SUFFIX = ".meta.json"
+IVFDATA_SUFFIX = ".ivfdata"
+
+IVF_TYPES = ("ivf_flat", "ivf_pq")
+
+
+def meta_path(index_path):
+    return index_path + META_SUFFIX
+
+
+# ======================================================
+# ---------------- BUILD -------------------------------
+# ======================================================
+
+def build_index(embeddings, index_type="flat", **params):
+    """
+    Build a cosine-similarity FAISS index over L2-normalized embeddings.
+
+    index_type: one of "flat", "ivf_flat", "ivf_pq", "hnsw"
+    params: overrides for INDEX_DEFAULTS[index_type]
+
+    Returns (index, params) where params are the values actually used.
+    """
+
+    if index_type not in INDEX_DEFAULTS:
+        raise ValueError(
+            f"Unknown index type '{index_type}'. "
+            f"Choose one of: {', '.join(INDEX_DEFAULTS)}"
+        )
+
+    params = {**INDEX_DEFAULTS[index_type], **params}
+
+    n, dim = embeddings.shape
+
+    if index_type == "flat":
+
+        index = faiss.IndexFlatIP(dim)
+
+    elif index_type in ("ivf_flat", "ivf_pq"):
+
+        # k-means needs at least one training point per list
+        params["nlist"] = max(1, min(params["nlist"], n))
+
+        quantizer = faiss.IndexFlatIP(dim)
+
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(
+                quantizer, dim, params["nlist"], faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            if dim % params["m"] != 0:
+                raise ValueError(
+                    f"PQ sub-quantizers m={params['m']} must divide dimension {dim}"
+                )
+            if n < 2 ** params["nbits"]:
+                raise ValueError(
+                    f"ivf_pq with nbits={params['nbits']} needs at least "
+                    f"{2 ** params['nbits']} vectors to train, got {n}"
+                )
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, params["nlist"], params["m"], params["nbits"],
+                faiss.METRIC_INNER_PRODUCT
+            )
+
+        index.train(embeddings)
+        index.nprobe = params["nprobe"]
+
+    else:
+
+        index = faiss.IndexHNSWFlat(dim, params["M"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+
+    index.add(embeddings)
+
+    return index, params
+
+
+# ======================================================
+# ---------------- SAVE / LOAD -------------------------
+# ======================================================
+
+def save_index(index, index_path, index_type, params, model_name=None, ondisk=True):
+    """
+    Write the index and a JSON metadata file next to it
+    (<index_path>.meta.json) describing how it was built.
+
+    ondisk: for IVF indexes, store the inverted lists in
+    <index_path>.ivfdata so they can be memory-mapped at load time.
+    """
+
+    layout = "memory"
+
+    if ondisk and index_type in IVF_TYPES:
+        _write_ondisk_ivf(index, index_path)
+        layout = "ondisk"
+    else:
+        faiss.write_index(index, index_path)
+
+    meta = {
+        "index_type": index_type,
+        "params": params,
+        "layout": layout,
+        "dim": index.d,
+        "ntotal": index.ntotal,
+        "metric": "inner_product",
+        "model": model_name,
+        "built_at": datetime.now().isoformat()
+    }
+
+    with open(meta_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def load_meta(index_path):
+    """
+    Read index metadata. Indexes built before metadata existed
+    are plain IndexFlatIP, so default to that.
+    """
+
+    path = meta_path(index_path)
+
+    if not os.path.exists(path):
+        return {"index_type": "flat", "params": {}}
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_ondisk_ivf(index, index_path):
+    """
+    Move the inverted lists of a populated IVF index into a flat
+    .ivfdata file (faiss OnDiskInvertedLists). The .index file then
+    only holds the quantizer and list offsets.
+    """
+
+    shard_path = index_path + ".shard"
+    faiss.write_index(index, shard_path)
+
+    trained = faiss.clone_index(index)
+    trained.reset()
+
+    merge_ondisk(trained, [shard_path], index_path + IVFDATA_SUFFIX)
+    faiss.write_index(trained, index_path)
+
+    os.remove(shard_path)
+
+
+class MmapFlatIndex:
+    """
+    Exact inner-product search over a memory-mapped embedding matrix.
+
+    Stands in for IndexFlatIP when the index is opened with mmap=True:
+    the vectors stay in the OS page cache (shared by every process
+    that maps data/embeddings.npy) instead of a private heap copy.
+    """
+
+    def __init__(self, embeddings, block_size=65536):
+        self.xb = embeddings
+        self.ntotal, self.d = embeddings.shape
+        self.block_size = block_size
+
+    def search(self, queries, k, params=None):
+
+        nq = queries.shape[0]
+        best_scores = np.full((nq, 0), -np.inf, dtype="float32")
+        best_ids = np.full((nq, 0), -1, dtype="int64")
+
+        for start in range(0, self.ntotal, self.block_size):
+
+            block = self.xb[start:start + self.block_size]
+
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            ids = np.concatenate([
+                best_ids,
+                np.broadcast_to(np.arange(start, start + len(block)), (nq, len(block)))
+            ], axis=1)
+
+            if scores.shape[1] > k:
+                part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, part, axis=1)
+                ids = np.take_along_axis(ids, part, axis=1)
+
+            best_scores, best_ids = scores, ids
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+
+        # pad like FAISS when the corpus has fewer than k vectors
+        missing = k - best_scores.shape[1]
+        if missing > 0:
+            best_scores = np.pad(best_scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+            best_ids = np.pad(best_ids, ((0, 0), (0, missing)), constant_values=-1)
+
+        return best_scores, best_ids
+
+
+def load_index(index_path, mmap=False, embeddings_path="data/embeddings.npy"):
+    """
+    Load the dense index described by <index_path>.meta.json.
+
+    mmap=True keeps vectors out of private memory:
+    - flat: searches data/embeddings.npy through np.load(mmap_mode="r")
+    - ivf_*: built with the on-disk layout; OnDiskInvertedLists maps
+      <index_path>.ivfdata and only the coarse quantizer is read
+    - hnsw: FAISS cannot map HNSW graphs, so it is read normally
+    """
+
+    meta = load_meta(index_path)
+    index_type = meta.get("index_type", "flat")
+
+    if mmap and index_type == "flat" and os.path.exists(embeddings_path):
+
+        embeddings = np.load(embeddings_path, mmap_mode="r")
+
+        if "ntotal" in meta and embeddings.shape[0] != meta["ntotal"]:
+            raise ValueError(
+                f"{embeddings_path} has {embeddings.shape[0]} rows but the index "
+                f"has {meta['ntotal']}. Re-run src/embed_index.py."
+            )
+
+        return MmapFlatIndex(embeddings), meta
+
+    if meta.get("layout") == "ondisk":
+        # resolve the .ivfdata file next to the index, wherever it was built
+        io_flags = getattr(faiss, "IO_FLAG_ONDISK_SAME_DIR", 0)
+        return faiss.read_index(index_path, io_flags), meta
+
+    if mmap and index_type != "flat":
+        print(f"Memory-mapping not available for {index_type} index, loading into memory")
+
+    return faiss.read_index(index_path), meta
+
+
+# ======================================================
+# ---------------- SEARCH ------------------------------
+# ======================================================
+
+def search_params(meta, nprobe=None, ef_search=None):
+    """
+    Per-call FAISS SearchParameters for the index type in meta.
+    Passing them to index.search keeps the shared index untouched,
+    so concurrent callers can use different recall/latency settings.
+    """
+
+    index_type = meta.get("index_type", "flat")
+    defaults = meta.get("params", {})
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(
+            nprobe=int(nprobe or defaults.get("nprobe", 1))
+        )
+
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(
+            efSearch=int(ef_search or defaults.get("ef_search", 16))
+        )
+
+    return None
+
+
+def search(index, meta, queries, top_k, nprobe=None, ef_search=None):
+    """
+    Search an (n, d) float32 matrix of normalized queries.
+    Returns (scores, ids) as FAISS does; ids may contain -1 when an
+    approximate index finds fewer than top_k neighbours.
+    """
+
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    params = search_params(meta, nprobe=nprobe, ef_search=ef_search)
+
+    if params is None:
+        return index.search(queries, top_k)
+
+    return index.search(queries, top_k, params=params)
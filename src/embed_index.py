@@ -5,18 +5,33 @@ os.environ["OPENBLAS_NUM_THREADS"] = "1"
 os.environ["NUMEXPR_NUM_THREADS"] = "1"
 os.environ["TRANSFORMERS_NO_TF"] = "1"
 
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
 import json
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-model = SentenceTransformer(
-    "all-MiniLM-L6-v2",
-    device="cpu",
-    trust_remote_code=False
-)
+from src.dense_index import INDEX_DEFAULTS, build_index, save_index
+from src.model_registry import get_sentence_transformer
+
+
+# ---------- INDEX CONFIG ----------
+# RAG_INDEX_TYPE: flat | ivf_flat | ivf_pq | hnsw
+# RAG_INDEX_PARAMS: JSON overrides, e.g. '{"nlist": 1024, "nprobe": 16}'
+
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+INDEX_PATH = "data/faiss.index"
+
+INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", "flat")
+INDEX_PARAMS = json.loads(os.environ.get("RAG_INDEX_PARAMS", "{}"))
+
+if INDEX_TYPE not in INDEX_DEFAULTS:
+    raise ValueError(f"RAG_INDEX_TYPE must be one of: {', '.join(INDEX_DEFAULTS)}")
+
+
+model = get_sentence_transformer(EMBED_MODEL_NAME, device="cpu")
 
 
 with open("data/corpus_chunks.json") as f:
@@ -39,13 +54,11 @@ print("Embedding shape:", embeddings.shape)
 
 faiss.normalize_L2(embeddings)
 
-dim = embeddings.shape[1]
-
-index = faiss.IndexFlatIP(dim)
-index.add(embeddings)
+index, params = build_index(embeddings, INDEX_TYPE, **INDEX_PARAMS)
+print("FAISS INDEX TYPE:", INDEX_TYPE, params)
 print("FAISS INDEX DIMENSION:", index.d)
 
-faiss.write_index(index, "data/faiss.index")
+save_index(index, INDEX_PATH, INDEX_TYPE, params, model_name=EMBED_MODEL_NAME)
 np.save("data/embeddings.npy", embeddings)
 
 print("Dense index created successfully")
@@ -0,0 +1,191 @@
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ======================================================
+# ---------------- QUERY EMBEDDING CACHE ---------------
+# ======================================================
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings, keyed by
+    (model name, normalized query text).
+
+    path: optional .npz file; entries are loaded from it on start-up
+    and written back by save(). Entries for other models are ignored.
+    """
+
+    def __init__(self, model_name, maxsize=10000, path=None):
+
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def normalize(query):
+        """Unicode NFKC + collapsed whitespace."""
+
+        return " ".join(unicodedata.normalize("NFKC", query).split())
+
+    def _key(self, query):
+        return (self.model_name, self.normalize(query))
+
+    # --------------------------------------------------
+    # LOOKUP
+    # --------------------------------------------------
+
+    def get(self, query):
+
+        key = self._key(query)
+
+        with self._lock:
+
+            vector = self._entries.get(key)
+
+            if vector is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query, vector):
+
+        if self.maxsize <= 0:
+            return
+
+        key = self._key(query)
+
+        with self._lock:
+
+            self._entries[key] = np.asarray(vector, dtype="float32")
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def encode(self, queries, encode_fn):
+        """
+        Embeddings for all queries as an (n, d) matrix. Misses are
+        normalized, deduplicated and passed to encode_fn(list of str)
+        in a single call, then cached.
+        """
+
+        vectors, missing = self._lookup(queries)
+
+        if missing:
+            return self._merge(queries, vectors, missing, encode_fn(missing))
+
+        return np.vstack(vectors).astype("float32")
+
+    async def encode_async(self, queries, encode_fn):
+        """encode() with an async encode_fn (awaited for the misses)."""
+
+        vectors, missing = self._lookup(queries)
+
+        if missing:
+            return self._merge(queries, vectors, missing, await encode_fn(missing))
+
+        return np.vstack(vectors).astype("float32")
+
+    def _lookup(self, queries):
+        """Cached vectors (None for misses) and the distinct normalized misses."""
+
+        vectors = [self.get(q) for q in queries]
+
+        missing = list(dict.fromkeys(
+            self.normalize(q) for q, v in zip(queries, vectors) if v is None
+        ))
+
+        return vectors, missing
+
+    def _merge(self, queries, vectors, missing, encoded):
+
+        encoded = dict(zip(missing, encoded))
+
+        for text, vector in encoded.items():
+            self.put(text, vector)
+
+        vectors = [
+            v if v is not None else encoded[self.normalize(q)]
+            for q, v in zip(queries, vectors)
+        ]
+
+        return np.vstack(vectors).astype("float32")
+
+    def stats(self):
+
+        with self._lock:
+
+            lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+    # --------------------------------------------------
+    # PERSISTENCE
+    # --------------------------------------------------
+
+    def save(self, path=None):
+
+        path = path or self.path
+        if not path:
+            return
+
+        with self._lock:
+            entries = list(self._entries.items())
+
+        if not entries:
+            return
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # write then rename so a crash never leaves a truncated file
+        tmp_path = path + ".tmp.npz"
+
+        np.savez(
+            tmp_path,
+            models=np.array([model for (model, _), _ in entries]),
+            queries=np.array([query for (_, query), _ in entries]),
+            vectors=np.vstack([vector for _, vector in entries])
+        )
+
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+
+        path = path or self.path
+
+        with np.load(path, allow_pickle=False) as data:
+            models = data["models"].tolist()
+            queries = data["queries"].tolist()
+            vectors = data["vectors"]
+
+        with self._lock:
+
+            for model, query, vector in zip(models, queries, vectors):
+                if model == self.model_name:
+                    self._entries[(model, query)] = vector
+
+            # oldest entries go first if the file is bigger than maxsize
+            while len(self._entries) > max(self.maxsize, 0):
+                self._entries.popitem(last=False)
@@ -1,14 +1,15 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import torch
 
-MODEL_NAME = "google/flan-t5-base"
+from src.model_registry import get_seq2seq
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+MODEL_NAME = "google/flan-t5-base"
 
-model = AutoModelForSeq2SeqLM.from_pretrained(
-    MODEL_NAME,
-    torch_dtype=torch.float32
-).to("cpu")
+# same instance as the RAG pipeline's generator when both run in one process
+tokenizer, model = get_seq2seq(MODEL_NAME, device="cpu", dtype="float32")
 
 
 def generate_answer(query, contexts):
@@ -0,0 +1,221 @@
+import gc
+import sys
+import threading
+import time
+
+
+# ======================================================
+# ---------------- MODEL REGISTRY ----------------------
+# ======================================================
+
+class ModelRegistry:
+    """
+    One shared instance per (kind, model name, device, dtype) for the
+    whole process, so the RAG pipeline, metrics, the LLM judge and the
+    question generator reuse the same weights instead of each loading
+    their own copy.
+
+    Loading is thread-safe: concurrent callers asking for the same
+    model wait for a single load. Each entry records its load time
+    and parameter memory (stats()). unload() drops the registry's
+    reference; the memory is freed once callers release theirs.
+    """
+
+    def __init__(self):
+
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, name, device="cpu", dtype="float32"):
+        return (kind, name, device, dtype)
+
+    def get(self, kind, name, loader, device="cpu", dtype="float32"):
+        """
+        The model registered under the key, created with
+        loader(name, device, dtype) on first request.
+        """
+
+        key = self.key(kind, name, device, dtype)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["requests"] += 1
+                return entry["model"]
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+
+            with self._lock:
+                entry = self._entries.get(key)
+
+            if entry is None:
+
+                start = time.perf_counter()
+                model = loader(name, device, dtype)
+                load_time = time.perf_counter() - start
+
+                entry = {
+                    "model": model,
+                    "load_time": load_time,
+                    "memory_bytes": _model_bytes(model),
+                    "loaded_at": time.time(),
+                    "requests": 0
+                }
+
+                print(f"Loaded {kind} model {name} ({device}, {dtype}) in {load_time:.1f}s")
+
+                with self._lock:
+                    self._entries[key] = entry
+
+        with self._lock:
+            entry["requests"] += 1
+
+        return entry["model"]
+
+    def unload(self, kind=None, name=None, device=None, dtype=None):
+        """
+        Drop every entry matching the given fields (all entries when
+        none are given). Returns the number of models unloaded.
+        """
+
+        wanted = (kind, name, device, dtype)
+
+        with self._lock:
+
+            keys = [
+                key for key in self._entries
+                if all(w is None or w == k for w, k in zip(wanted, key))
+            ]
+
+            for key in keys:
+                del self._entries[key]
+
+        if keys:
+            gc.collect()
+            _empty_device_cache()
+
+        return len(keys)
+
+    def loaded(self):
+
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self):
+
+        with self._lock:
+
+            return [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "device": device,
+                    "dtype": dtype,
+                    "load_time_sec": round(entry["load_time"], 3),
+                    "memory_mb": round(entry["memory_bytes"] / 2**20, 1),
+                    "requests": entry["requests"]
+                }
+                for (kind, name, device, dtype), entry in self._entries.items()
+            ]
+
+
+def _torch_modules(model):
+    """The torch modules inside a registered model object."""
+
+    parts = model if isinstance(model, tuple) else (model,)
+
+    return [part for part in parts if hasattr(part, "parameters")]
+
+
+def _model_bytes(model):
+    """Parameter + buffer memory of a loaded model."""
+
+    total = 0
+
+    for module in _torch_modules(model):
+
+        tensors = list(module.parameters())
+        if hasattr(module, "buffers"):
+            tensors += list(module.buffers())
+
+        total += sum(t.numel() * t.element_size() for t in tensors)
+
+    return total
+
+
+def _empty_device_cache():
+
+    torch = sys.modules.get("torch")
+
+    if torch is not None and hasattr(torch, "cuda") and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _torch_dtype(dtype):
+
+    import torch
+
+    return getattr(torch, dtype)
+
+
+# ======================================================
+# ---------------- LOADERS -----------------------------
+# ======================================================
+
+def _load_sentence_transformer(name, device, dtype):
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(name, device=device)
+
+    if dtype != "float32":
+        model = model.to(_torch_dtype(dtype))
+
+    return model
+
+
+def _load_seq2seq(name, device, dtype):
+
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(name, torch_dtype=_torch_dtype(dtype))
+
+    model.to(device)
+    model.eval()
+
+    return tokenizer, model
+
+
+# ======================================================
+# ---------------- SHARED REGISTRY ---------------------
+# ======================================================
+
+registry = ModelRegistry()
+
+
+def get_sentence_transformer(name, device="cpu", dtype="float32"):
+    """Shared SentenceTransformer for name / device / dtype."""
+
+    return registry.get("sentence_transformer", name, _load_sentence_transformer, device, dtype)
+
+
+def get_seq2seq(name, device="cpu", dtype="float32"):
+    """Shared (tokenizer, model) pair for a seq2seq checkpoint, in eval mode."""
+
+    return registry.get("seq2seq", name, _load_seq2seq, device, dtype)
+
+
+def unload(name=None, device=None, dtype=None, kind=None):
+    """Unload matching models from the shared registry (see ModelRegistry.unload)."""
+
+    return registry.unload(kind, name, device, dtype)
+
+
+def stats():
+    """Load time, memory and request count per loaded model."""
+
+    return registry.stats()
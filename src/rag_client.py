@@ -0,0 +1,116 @@
+import json
+import urllib.error
+import urllib.request
+
+
+# ======================================================
+# ---------------- RAG SERVER CLIENT -------------------
+# ======================================================
+
+class RAGServerError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class RAGClient:
+    """
+    Client for src/server.py with the same calls as the module-level
+    rag_pipeline API (retrieve, generate, run_rag, run_rag_stream), so
+    app.py can switch between in-process and served engines.
+    """
+
+    def __init__(self, url, timeout=120):
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+
+        request = urllib.request.Request(
+            self.url + path,
+            data=data,
+            headers={"Content-Type": "application/json"},
+            method="GET" if payload is None else "POST"
+        )
+
+        try:
+            # socket timeout slightly above the server's request timeout
+            return urllib.request.urlopen(request, timeout=self.timeout + 5)
+        except urllib.error.HTTPError as exc:
+            try:
+                message = json.loads(exc.read()).get("error", exc.reason)
+            except ValueError:
+                message = exc.reason
+            raise RAGServerError(exc.code, message) from None
+
+    def _call(self, path, payload=None):
+
+        with self._request(path, payload) as response:
+            return json.loads(response.read())
+
+    @staticmethod
+    def _params(query, mode, top_k, final_k, nprobe, ef_search, rrf_k):
+
+        params = {
+            "query": query, "mode": mode, "top_k": top_k, "final_k": final_k,
+            "nprobe": nprobe, "ef_search": ef_search, "rrf_k": rrf_k
+        }
+
+        # unset values fall back to the server's defaults
+        return {k: v for k, v in params.items() if v is not None}
+
+    def retrieve(self, query, mode="hybrid", top_k=10, final_k=5, nprobe=None, ef_search=None,
+                 rrf_k=None):
+
+        return self._call("/retrieve", {
+            **self._params(query, mode, top_k, final_k, nprobe, ef_search, rrf_k),
+            "timeout": self.timeout
+        })
+
+    def generate(self, query, final_context):
+
+        return self._call("/generate", {
+            "query": query, "final_context": final_context, "timeout": self.timeout
+        })["answer"]
+
+    def run_rag(self, query, mode="hybrid", top_k=10, final_k=5, nprobe=None, ef_search=None,
+                rrf_k=None):
+
+        return self._call("/answer", {
+            **self._params(query, mode, top_k, final_k, nprobe, ef_search, rrf_k),
+            "timeout": self.timeout
+        })
+
+    def run_rag_stream(self, query, mode="hybrid", top_k=10, final_k=5, nprobe=None,
+                       ef_search=None, rrf_k=None):
+        """Yields the same events as rag_pipeline.run_rag_stream."""
+
+        payload = {
+            **self._params(query, mode, top_k, final_k, nprobe, ef_search, rrf_k),
+            "timeout": self.timeout
+        }
+
+        with self._request("/answer/stream", payload) as response:
+
+            for line in response:
+
+                if not line.strip():
+                    continue
+
+                event = json.loads(line)
+
+                if event.get("type") == "error":
+                    raise RAGServerError(event.get("status", 500), event.get("error"))
+
+                yield event
+
+    def health(self):
+        return self._call("/health")
+
+    def metrics(self):
+        return self._call("/metrics")
@@ -6,243 +6,1381 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["MKL_NUM_THREADS"] = "1"
 
-import torch
-torch.set_num_threads(1)
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import asyncio
+import atexit
 import json
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from rank_bm25 import BM25Okapi
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
+import numpy as np
 
-# ======================================================
-# ---------------- EMBEDDING MODEL ---------------------
-# ======================================================
+from src.batching import MicroBatcher
+from src.embedding_cache import QueryEmbeddingCache
+from src.model_registry import get_sentence_transformer, get_seq2seq, unload as unload_models
+from src.response_cache import ResponseCache
+from src.sparse_index import SparseIndex, corpus_fingerprint, load_meta as sparse_load_meta
 
-embed_model = SentenceTransformer(
-    "all-MiniLM-L6-v2",
-    device="cpu"
-)
+# torch, sentence_transformers, transformers and faiss are imported by
+# the loaders that need them, so importing this module stays cheap and
+# a sparse-only engine never pulls in a torch model.
 
 
 # ======================================================
-# ---------------- GENERATION MODEL --------------------
+# ---------------- CONFIGURATION -----------------------
 # ======================================================
 
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
 GEN_MODEL_NAME = "google/flan-t5-base"
 
-gen_tokenizer = AutoTokenizer.from_pretrained(GEN_MODEL_NAME)
-gen_model = AutoModelForSeq2SeqLM.from_pretrained(GEN_MODEL_NAME)
+CORPUS_PATH = "data/corpus_chunks.json"
+SPARSE_INDEX_PATH = "data/sparse_index"
+DENSE_INDEX_PATH = "data/faiss.index"
+
+
+@dataclass
+class RAGConfig:
+    """
+    What a RAGEngine loads and how. from_env() fills the fields from
+    the RAG_* environment variables (see README).
+    """
+
+    corpus_path: str = CORPUS_PATH
+    sparse_index_path: str = SPARSE_INDEX_PATH
+    dense_index_path: str = DENSE_INDEX_PATH
+
+    embed_model_name: str = EMBED_MODEL_NAME
+    gen_model_name: str = GEN_MODEL_NAME
+    device: str = "cpu"
+    dtype: str = "float32"
+
+    # RAG_MMAP: map the dense vectors from disk instead of copying
+    # them into each process
+    mmap: bool = False
+
+    # RAG_PARALLEL_RETRIEVAL: dense and sparse side by side in hybrid mode
+    parallel_retrieval: bool = True
+
+    # RAG_QUERY_CACHE_SIZE / RAG_QUERY_CACHE_PATH
+    query_cache_size: int = 10000
+    query_cache_path: str = None
+
+    # RAG_CACHE / RAG_CACHE_PATH / RAG_CACHE_SIZE
+    cache: bool = True
+    cache_path: str = "data/rag_cache.sqlite"
+    cache_size: int = 1024
+
+    # RAG_SEMANTIC_CACHE / _THRESHOLD / _CACHE_SIZE / _CACHE_TTL
+    semantic_cache: bool = False
+    semantic_threshold: float = 0.92
+    semantic_cache_size: int = 1000
+    semantic_cache_ttl: float = 3600
+
+    # RAG_GEN_BATCHING / RAG_GEN_BATCH_SIZE / RAG_GEN_BATCH_WAIT_MS:
+    # coalesce concurrent generate calls (threads sharing the engine)
+    gen_batching: bool = False
+    gen_batch_size: int = 8
+    gen_batch_wait: float = 0.01
+
+    # RAG_EMBED_BATCHING / RAG_EMBED_BATCH_SIZE / RAG_EMBED_BATCH_WAIT_MS:
+    # coalesce concurrent query encodings into one MiniLM call
+    embed_batching: bool = False
+    embed_batch_size: int = 32
+    embed_batch_wait: float = 0.005
+
+    @classmethod
+    def from_env(cls, **overrides):
+
+        env = os.environ.get
+
+        values = {
+            "mmap": env("RAG_MMAP", "0") == "1",
+            "parallel_retrieval": env("RAG_PARALLEL_RETRIEVAL", "1") == "1",
+            "query_cache_size": int(env("RAG_QUERY_CACHE_SIZE", "10000")),
+            "query_cache_path": env("RAG_QUERY_CACHE_PATH") or None,
+            "cache": env("RAG_CACHE", "1") == "1",
+            "cache_path": env("RAG_CACHE_PATH", "data/rag_cache.sqlite"),
+            "cache_size": int(env("RAG_CACHE_SIZE", "1024")),
+            "semantic_cache": env("RAG_SEMANTIC_CACHE", "0") == "1",
+            "semantic_threshold": float(env("RAG_SEMANTIC_THRESHOLD", "0.92")),
+            "semantic_cache_size": int(env("RAG_SEMANTIC_CACHE_SIZE", "1000")),
+            "semantic_cache_ttl": float(env("RAG_SEMANTIC_CACHE_TTL", "3600")),
+            "gen_batching": env("RAG_GEN_BATCHING", "0") == "1",
+            "gen_batch_size": int(env("RAG_GEN_BATCH_SIZE", "8")),
+            "gen_batch_wait": float(env("RAG_GEN_BATCH_WAIT_MS", "10")) / 1000,
+            "embed_batching": env("RAG_EMBED_BATCHING", "0") == "1",
+            "embed_batch_size": int(env("RAG_EMBED_BATCH_SIZE", "32")),
+            "embed_batch_wait": float(env("RAG_EMBED_BATCH_WAIT_MS", "5")) / 1000
+        }
+
+        values.update(overrides)
 
-gen_model.to("cpu")
-gen_model.eval()
+        return cls(**values)
 
 
 # ======================================================
-# ---------------- LOAD DATA ---------------------------
+# ---------------- RRF FUSION --------------------------
 # ======================================================
 
-with open("data/corpus_chunks.json", "r", encoding="utf-8") as f:
-    corpus = json.load(f)
+RRF_K = 60
+
+
+def rrf_fusion(dense_ids, sparse_results, k=RRF_K):
+
+    scores = {}
+
+    # Dense contribution
+    for rank, idx in enumerate(dense_ids):
+        scores[idx] = scores.get(idx, 0) + 1 / (k + rank + 1)
 
-texts = [d["text"] for d in corpus]
+    # Sparse contribution
+    for rank, (idx, _) in enumerate(sparse_results):
+        scores[idx] = scores.get(idx, 0) + 1 / (k + rank + 1)
 
-bm25 = BM25Okapi([t.split() for t in texts])
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
 
 
 # ======================================================
-# ---------------- LOAD FAISS --------------------------
+# ---------------- CONCURRENT RETRIEVAL ----------------
 # ======================================================
 
-index = faiss.read_index("data/faiss.index")
-faiss.omp_set_num_threads(1)
+# Dense (MiniLM + FAISS) and sparse (BM25) retrieval release the GIL
+# in their heavy parts, so hybrid mode runs them side by side and
+# joins at RRF fusion: sparse on this pool, dense on the calling
+# thread, so concurrent callers' query encodings reach the embedding
+# batcher together. The pool is sized for many concurrent callers.
+# RAG_PARALLEL_RETRIEVAL=0 runs them in sequence.
+
+RETRIEVAL_THREADS = int(
+    os.environ.get("RAG_RETRIEVAL_THREADS", min(32, (os.cpu_count() or 1) + 4))
+)
+
+_retrieval_executor = None
+_retrieval_executor_lock = threading.Lock()
+
 
-print("FAISS index dimension:", index.d)
+def _get_retrieval_executor():
+
+    global _retrieval_executor
+
+    with _retrieval_executor_lock:
+
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(
+                max_workers=RETRIEVAL_THREADS,
+                thread_name_prefix="rag-retrieval"
+            )
+
+    return _retrieval_executor
+
+
+def _timed(fn, *args):
+    """Run fn(*args) and return (result, seconds)."""
+
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _semantic_result(hit, start):
+    """run_rag-style result from a semantic cache hit (result, similarity, query)."""
+
+    result, similarity, matched_query = hit
+
+    result["cache"] = {"semantic": "hit"}
+    result["semantic_match"] = {
+        "query": matched_query,
+        "similarity": round(similarity, 4)
+    }
+    result["timings"] = {"total": round(time.perf_counter() - start, 4)}
+
+    return result
+
+
+def _empty_result(mode):
+
+    return {
+        "answer": "Empty query",
+        "sources": [],
+        "mode": mode
+    }
 
 
 # ======================================================
-# ---------------- RRF FUSION --------------------------
+# ---------------- LLM PROMPT / CONFIG -----------------
 # ======================================================
 
-def rrf_fusion(dense_ids, sparse_results, k=60):
+def _build_prompt(query, contexts):
 
-    scores = {}
+    context_text = "\n\n".join(contexts)
 
-    # Dense contribution
-    for rank, idx in enumerate(dense_ids):
-        scores[idx] = scores.get(idx, 0) + 1 / (k + rank + 1)
+    return (
+        "Answer the question using ONLY the context below.\n\n"
+        f"Context:\n{context_text}\n\n"
+        f"Question:\n{query}\n\n"
+        "Answer:"
+    )
 
-    # Sparse contribution
-    for rank, (idx, _) in enumerate(sparse_results):
-        scores[idx] = scores.get(idx, 0) + 1 / (k + rank + 1)
 
-    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+GEN_CONFIG = {
+    "max_new_tokens": 150,
+    "num_beams": 2,
+    "do_sample": False
+}
+
+# Streaming decodes greedily: beam search can revise earlier tokens,
+# so it cannot emit them as they are produced.
+STREAM_GEN_CONFIG = {
+    "max_new_tokens": 150,
+    "num_beams": 1,
+    "do_sample": False
+}
+
+GEN_MAX_INPUT_LENGTH = 1024
+
+# changes to the prompt wording invalidate cached answers
+PROMPT_TEMPLATE = _build_prompt("{query}", ["{context}"])
+
+
+def _import_torch():
+
+    import torch
+    torch.set_num_threads(1)
+
+    return torch
 
 
 # ======================================================
-# ---------------- MAIN RAG PIPELINE -------------------
+# ---------------- RAG ENGINE --------------------------
 # ======================================================
 
-def run_rag(query, mode="hybrid", top_k=10, final_k=5):
+class RAGEngine:
+    """
+    The RAG pipeline: corpus, BM25 and FAISS indexes, embedding and
+    generation models, and the caches in front of them.
+
+    Components load on first use, once, even when several threads
+    ask at the same time: sparse retrieval loads the corpus and BM25
+    only; dense retrieval adds MiniLM and FAISS; generation adds
+    flan-t5. load() loads everything (or the named components) up
+    front, e.g. before serving requests.
+    """
+
+    COMPONENTS = (
+        "corpus", "sparse", "dense", "embedder", "embed_batcher", "query_cache",
+        "generator", "gen_batcher", "index_version", "response_cache", "semantic_cache"
+    )
+
+    def __init__(self, config=None):
+
+        self.config = config or RAGConfig.from_env()
+
+        self._components = {}
+        self._locks = {name: threading.Lock() for name in self.COMPONENTS}
+
+    # --------------------------------------------------
+    # LAZY LOADING
+    # --------------------------------------------------
+
+    def _component(self, name):
+
+        try:
+            return self._components[name]
+        except KeyError:
+            pass
+
+        with self._locks[name]:
+            if name not in self._components:
+                self._components[name] = getattr(self, f"_load_{name}")()
+
+        return self._components[name]
+
+    def load(self, *components):
+        """Load the named components (default: all) now. Returns self."""
+
+        for name in components or self.COMPONENTS:
+
+            if name not in self.COMPONENTS:
+                raise ValueError(f"Unknown component: {name}")
+
+            self._component(name)
+
+        return self
+
+    def loaded(self):
+        """Names of the components loaded so far."""
+
+        return [name for name in self.COMPONENTS if name in self._components]
+
+    def unload(self, *components):
+        """
+        Drop the named components (default: all); they reload on next
+        use. Unloading "embedder" / "generator" also releases the model
+        from the shared registry.
+        """
+
+        models = {
+            "embedder": self.config.embed_model_name,
+            "generator": self.config.gen_model_name
+        }
+
+        for name in components or self.COMPONENTS:
+
+            if name not in self.COMPONENTS:
+                raise ValueError(f"Unknown component: {name}")
+
+            with self._locks[name]:
+                component = self._components.pop(name, None)
+
+            if isinstance(component, MicroBatcher):
+                component.close()
+
+            if component is not None and name in models:
+                unload_models(models[name], self.config.device, self.config.dtype)
+
+    def stats(self):
+        """Counters of the loaded caches and batchers."""
 
-    if not query.strip():
         return {
-            "answer": "Empty query",
-            "sources": [],
-            "mode": mode
+            name: component.stats()
+            for name, component in list(self._components.items())
+            if name in (
+                "query_cache", "response_cache", "semantic_cache", "embed_batcher", "gen_batcher"
+            )
+            and component is not None
         }
 
-    dense_results = []
-    sparse_results = []
-    rrf_results = []
+    def _load_corpus(self):
+
+        with open(self.config.corpus_path, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+
+        return corpus, [d["text"] for d in corpus]
+
+    def _load_sparse(self):
+
+        # inverted index written by bm25_index.py, memory-mapped
+        # (same scores as rank_bm25.BM25Okapi)
+
+        path = self.config.sparse_index_path
+        meta = sparse_load_meta(path)
+
+        # same size is not enough: a re-ingested corpus can keep it
+        if (meta.get("corpus_size") == len(self.texts)
+                and meta.get("corpus_fingerprint") == corpus_fingerprint(self.texts)):
+            return SparseIndex.load(path)
+
+        print(f"No up-to-date BM25 index in {path}, building in memory "
+              "(run src/bm25_index.py to persist it)")
+
+        return SparseIndex.build([t.split() for t in self.texts])
+
+    def _load_dense(self):
 
+        # Index type (flat / ivf_flat / ivf_pq / hnsw) comes from the
+        # metadata written by embed_index.py.
 
-    # ==================================================
-    # ---------------- DENSE RETRIEVAL ----------------
-    # ==================================================
+        import faiss
+        from src.dense_index import load_index
 
-    if mode in ["dense", "hybrid"]:
+        index, index_meta = load_index(self.config.dense_index_path, mmap=self.config.mmap)
+        faiss.omp_set_num_threads(1)
 
-        q_emb = embed_model.encode(query, show_progress_bar=False)
+        print("FAISS index:", index_meta.get("index_type", "flat"), "| dimension:", index.d)
 
-        q_emb = np.array(q_emb).astype("float32").reshape(1, -1)
+        return index, index_meta
+
+    def _load_embedder(self):
+
+        _import_torch()
+
+        return get_sentence_transformer(
+            self.config.embed_model_name, self.config.device, self.config.dtype
+        )
+
+    def _load_embed_batcher(self):
+
+        # Queries from concurrent callers are encoded together: up to
+        # embed_batch_size per MiniLM call, waiting at most
+        # embed_batch_wait for more to arrive.
+
+        if not self.config.embed_batching:
+            return None
+
+        return MicroBatcher(
+            self._embed,
+            max_batch_size=self.config.embed_batch_size,
+            max_wait=self.config.embed_batch_wait,
+            name="rag-query-embedding"
+        )
+
+    def _load_query_cache(self):
+
+        # Repeated questions skip the encoder; a path keeps the cache
+        # across runs, size 0 disables it.
+
+        query_cache = QueryEmbeddingCache(
+            self.config.embed_model_name,
+            maxsize=self.config.query_cache_size,
+            path=self.config.query_cache_path
+        )
+
+        if query_cache.path:
+            atexit.register(query_cache.save)
+
+        return query_cache
+
+    def _load_generator(self):
+
+        _import_torch()
+
+        # shared with anything else in the process using the same checkpoint
+        return get_seq2seq(self.config.gen_model_name, self.config.device, self.config.dtype)
+
+    def _load_gen_batcher(self):
+
+        # Concurrent callers' prompts are padded into one generate call:
+        # up to gen_batch_size prompts, waiting at most gen_batch_wait
+        # for the batch to fill. Only the beam-search path is batched;
+        # streams keep their own generate call.
+
+        if not self.config.gen_batching:
+            return None
+
+        return MicroBatcher(
+            self._generate_padded,
+            max_batch_size=self.config.gen_batch_size,
+            max_wait=self.config.gen_batch_wait,
+            name="rag-generation"
+        )
+
+    def _load_index_version(self):
+
+        # Cache keys include this, so rebuilding the corpus or either
+        # index invalidates old entries. Only metadata is read.
+
+        from src.dense_index import load_meta as dense_load_meta
+
+        corpus_stat = os.stat(self.config.corpus_path)
+
+        return ResponseCache.make_key(
+            dense_load_meta(self.config.dense_index_path),
+            sparse_load_meta(self.config.sparse_index_path)
+            or {"in_memory": self.bm25.corpus_size},
+            corpus_stat.st_size,
+            corpus_stat.st_mtime
+        )[:16]
+
+    def _load_response_cache(self):
+
+        # Retrieval results and generated answers, in memory and in SQLite.
+
+        if not self.config.cache:
+            return None
+
+        return ResponseCache(
+            path=self.config.cache_path,
+            maxsize=self.config.cache_size,
+            version=self.index_version
+        )
+
+    def _load_semantic_cache(self):
+
+        # Optional near-duplicate cache in front of run_rag_batch.
+
+        if not self.config.semantic_cache:
+            return None
+
+        from src.semantic_cache import SemanticCache
+
+        return SemanticCache(
+            self.embed_model.get_sentence_embedding_dimension(),
+            threshold=self.config.semantic_threshold,
+            maxsize=self.config.semantic_cache_size,
+            ttl=self.config.semantic_cache_ttl
+        )
+
+    @property
+    def corpus(self):
+        return self._component("corpus")[0]
+
+    @property
+    def texts(self):
+        return self._component("corpus")[1]
+
+    @property
+    def bm25(self):
+        return self._component("sparse")
+
+    @property
+    def index(self):
+        return self._component("dense")[0]
+
+    @property
+    def index_meta(self):
+        return self._component("dense")[1]
+
+    @property
+    def embed_model(self):
+        return self._component("embedder")
+
+    @property
+    def query_cache(self):
+        return self._component("query_cache")
+
+    @property
+    def gen_tokenizer(self):
+        return self._component("generator")[0]
+
+    @property
+    def gen_model(self):
+        return self._component("generator")[1]
+
+    @property
+    def index_version(self):
+        return self._component("index_version")
+
+    @property
+    def response_cache(self):
+        return self._component("response_cache")
+
+    @property
+    def semantic_cache(self):
+        return self._component("semantic_cache")
+
+    # --------------------------------------------------
+    # CACHE KEYS
+    # --------------------------------------------------
+
+    def _cache_get(self, key):
+        cache = self.response_cache
+        return cache.get(key) if cache is not None else None
+
+    def _cache_put(self, key, value):
+        cache = self.response_cache
+        if cache is not None:
+            cache.put(key, value)
+
+    def _retrieval_key(self, query, mode, top_k, final_k, nprobe, ef_search, rrf_k):
+
+        return ResponseCache.make_key(
+            "retrieval", QueryEmbeddingCache.normalize(query),
+            mode, top_k, final_k, nprobe, ef_search, rrf_k,
+            self.config.embed_model_name, self.index_version
+        )
+
+    def _answer_key(self, query, final_context, gen_config=GEN_CONFIG):
+
+        return ResponseCache.make_key(
+            "answer", QueryEmbeddingCache.normalize(query),
+            [item["chunk_id"] for item in final_context],
+            self.config.gen_model_name, gen_config, GEN_MAX_INPUT_LENGTH, PROMPT_TEMPLATE,
+            self.index_version
+        )
+
+    # --------------------------------------------------
+    # RETRIEVAL STAGES
+    # --------------------------------------------------
+
+    def _result_item(self, idx, score, rank):
+
+        return {
+            "rank": rank,
+            "chunk": self.texts[idx],
+            "url": self.corpus[idx]["url"],
+            "score": float(score),
+            "chunk_id": int(idx)
+        }
+
+    def _embed(self, queries):
+        """Encode queries in one forward pass -> (n, d) normalized float32."""
+
+        import faiss
+
+        q_emb = self.embed_model.encode(queries, show_progress_bar=False)
+
+        q_emb = np.array(q_emb).astype("float32").reshape(len(queries), -1)
 
         # cosine similarity
         faiss.normalize_L2(q_emb)
 
-        dense_scores, dense_ids = index.search(q_emb, top_k)
+        return q_emb
+
+    def _embed_queries(self, queries):
+        """
+        _embed(), through the embedding batcher when it is enabled, so
+        single queries from concurrent callers share a forward pass.
+        Lists that fill a batch on their own are encoded directly.
+        """
+
+        batcher = self._component("embed_batcher")
+
+        if batcher is None or len(queries) >= batcher.max_batch_size:
+            return self._embed(queries)
 
-        for rank, (idx, score) in enumerate(zip(dense_ids[0], dense_scores[0])):
+        return np.vstack(batcher.map(queries))
 
-            dense_results.append({
-                "rank": rank + 1,
-                "chunk": texts[idx],
-                "url": corpus[idx]["url"],
-                "score": float(score),
-                "chunk_id": idx
-            })
+    async def _embed_queries_async(self, queries):
 
+        batcher = self._component("embed_batcher")
 
-    # ==================================================
-    # ---------------- SPARSE RETRIEVAL ----------------
-    # ==================================================
+        if batcher is None or len(queries) >= batcher.max_batch_size:
+            return await asyncio.to_thread(self._embed, queries)
 
-    if mode in ["sparse", "hybrid"]:
+        return np.vstack(await asyncio.gather(*(batcher.submit_async(q) for q in queries)))
 
-        bm25_scores = bm25.get_scores(query.split())
+    def encode_queries(self, queries):
+        """Normalized query embeddings (n, d), served from query_cache where possible."""
 
-        sparse_top = sorted(
-            enumerate(bm25_scores),
-            key=lambda x: x[1],
-            reverse=True
-        )[:top_k]
+        return self.query_cache.encode(queries, self._embed_queries)
 
-        for rank, (idx, score) in enumerate(sparse_top):
+    async def encode_queries_async(self, queries):
+        """encode_queries() for asyncio callers; the event loop is not blocked."""
 
-            sparse_results.append({
-                "rank": rank + 1,
-                "chunk": texts[idx],
-                "url": corpus[idx]["url"],
-                "score": float(score),
-                "chunk_id": idx
-            })
+        # loading the model or the cache is the only blocking part left
+        if "embedder" not in self._components or "query_cache" not in self._components:
+            await asyncio.to_thread(self.load, "embedder", "embed_batcher", "query_cache")
 
+        return await self.query_cache.encode_async(queries, self._embed_queries_async)
 
-    # ==================================================
-    # ---------------- FINAL CONTEXT -------------------
-    # ==================================================
+    def _dense_retrieve_batch(self, queries, top_k, nprobe=None, ef_search=None):
+        """One FAISS search over the (n, d) query matrix."""
 
-    # HYBRID (RRF)
-    if mode == "hybrid":
+        from src.dense_index import search as dense_search
+
+        q_emb = self.encode_queries(queries)
+
+        dense_scores, dense_ids = dense_search(
+            self.index, self.index_meta, q_emb, top_k,
+            nprobe=nprobe, ef_search=ef_search
+        )
+
+        batch_results = []
+
+        for ids, scores in zip(dense_ids, dense_scores):
+
+            # approximate indexes pad with -1 when fewer than top_k are found
+            hits = [(idx, score) for idx, score in zip(ids, scores) if idx >= 0]
+
+            batch_results.append([
+                self._result_item(idx, score, rank + 1)
+                for rank, (idx, score) in enumerate(hits)
+            ])
+
+        return batch_results
+
+    def _sparse_retrieve_batch(self, queries, top_k):
+
+        # only the postings of the query terms are scored
+        return [
+            [
+                self._result_item(idx, score, rank + 1)
+                for rank, (idx, score) in enumerate(self.bm25.top_k(query.split(), top_k))
+            ]
+            for query in queries
+        ]
+
+    def _fuse(self, dense_results, sparse_results, rrf_k=RRF_K):
 
         dense_ids_list = [d["chunk_id"] for d in dense_results]
         sparse_ids_list = [(s["chunk_id"], s["score"]) for s in sparse_results]
 
-        fused = rrf_fusion(dense_ids_list, sparse_ids_list)
-
-        for idx, score in fused:
+        fused = rrf_fusion(dense_ids_list, sparse_ids_list, k=rrf_k)
 
-            rrf_results.append({
-                "chunk": texts[idx],
-                "url": corpus[idx]["url"],
+        return [
+            {
+                "chunk": self.texts[idx],
+                "url": self.corpus[idx]["url"],
                 "rrf_score": float(score),
-                "chunk_id": idx
-            })
+                "chunk_id": int(idx)
+            }
+            for idx, score in fused
+        ]
+
+    def _run_retrievers(self, queries, mode, top_k, nprobe=None, ef_search=None):
+        """
+        Dense and sparse retrieval for a batch of queries, concurrently
+        in hybrid mode. Returns (dense_batch, sparse_batch, timings).
+        """
+
+        no_results = ([[] for _ in queries], 0.0)
+
+        run_dense = mode in ["dense", "hybrid"]
+        run_sparse = mode in ["sparse", "hybrid"]
+
+        if run_dense and run_sparse and self.config.parallel_retrieval:
+
+            sparse_future = _get_retrieval_executor().submit(
+                _timed, self._sparse_retrieve_batch, queries, top_k
+            )
+
+            dense_batch, dense_time = _timed(
+                self._dense_retrieve_batch, queries, top_k, nprobe, ef_search
+            )
+            sparse_batch, sparse_time = sparse_future.result()
+
+        else:
+
+            dense_batch, dense_time = (
+                _timed(self._dense_retrieve_batch, queries, top_k, nprobe, ef_search)
+                if run_dense else no_results
+            )
+            sparse_batch, sparse_time = (
+                _timed(self._sparse_retrieve_batch, queries, top_k)
+                if run_sparse else no_results
+            )
+
+        timings = {
+            "dense": round(dense_time, 4),
+            "sparse": round(sparse_time, 4)
+        }
+
+        return dense_batch, sparse_batch, timings
+
+    def _mode_result(self, mode, dense_results, sparse_results, final_k, rrf_k=RRF_K):
+        """One mode's retrieval output from the two rankings -> (result, fusion seconds)."""
+
+        rrf_results = []
+        fusion_time = 0.0
+
+        # HYBRID (RRF)
+        if mode == "hybrid":
+            rrf_results, fusion_time = _timed(self._fuse, dense_results, sparse_results, rrf_k)
+            final_context = rrf_results[:final_k]
+
+        # DENSE ONLY
+        elif mode == "dense":
+            final_context = dense_results[:final_k]
+
+        # SPARSE ONLY
+        else:
+            final_context = sparse_results[:final_k]
+
+        result = {
+            "sources": [item["url"] for item in final_context],
+            "mode": mode,
+
+            # Final context
+            "final_context": final_context,
+            "retrieved_chunks": final_context,
+
+            # Debug retrieval outputs
+            "dense_results": dense_results if mode != "sparse" else [],
+            "sparse_results": sparse_results if mode != "dense" else [],
+            "rrf_results": rrf_results
+        }
 
-        final_context = rrf_results[:final_k]
+        return result, fusion_time
 
-    # DENSE ONLY
-    elif mode == "dense":
+    def retrieve_batch(self, queries, mode="hybrid", top_k=10, final_k=5, nprobe=None,
+                       ef_search=None, rrf_k=RRF_K):
+        """
+        Retrieval for many queries at once: one encoder forward pass,
+        one FAISS search over all query vectors, then BM25 per query.
 
-        final_context = dense_results[:final_k]
+        Returns one dict per query with the same retrieval fields as
+        run_rag (everything except "answer"). Empty queries get
+        {"answer": "Empty query", "sources": [], "mode": mode}.
+        """
 
-    # SPARSE ONLY
-    else:
+        start = time.perf_counter()
 
-        final_context = sparse_results[:final_k]
+        outputs = [_empty_result(mode) for _ in queries]
+        keys = {}
+        live = []
 
+        for i, query in enumerate(queries):
 
-    contexts = [item["chunk"] for item in final_context]
-    sources = [item["url"] for item in final_context]
+            if not query.strip():
+                continue
 
+            keys[i] = self._retrieval_key(query, mode, top_k, final_k, nprobe, ef_search, rrf_k)
+            cached = self._cache_get(keys[i])
 
-    # ==================================================
-    # ---------------- LLM GENERATION ------------------
-    # ==================================================
+            if cached is None:
+                live.append(i)
+                continue
 
-    if contexts:
+            cached["timings"] = {"retrieval": round(time.perf_counter() - start, 4)}
+            cached["cache"] = {"retrieval": "hit"}
+            outputs[i] = cached
 
-        context_text = "\n\n".join(contexts)
+        if not live:
+            return outputs
 
-        prompt = (
-            "Answer the question using ONLY the context below.\n\n"
-            f"Context:\n{context_text}\n\n"
-            f"Question:\n{query}\n\n"
-            "Answer:"
+        dense_batch, sparse_batch, stage_timings = self._run_retrievers(
+            [queries[i] for i in live], mode, top_k, nprobe, ef_search
         )
 
-        inputs = gen_tokenizer(
-            prompt,
+        for i, dense_results, sparse_results in zip(live, dense_batch, sparse_batch):
+
+            outputs[i], fusion_time = self._mode_result(
+                mode, dense_results, sparse_results, final_k, rrf_k
+            )
+
+            self._cache_put(keys[i], outputs[i])
+
+            # Stage latencies in seconds. Dense / sparse cover the
+            # whole batch; with parallel retrieval, "retrieval"
+            # approaches max(dense, sparse) rather than their sum.
+            outputs[i]["timings"] = {
+                **stage_timings,
+                "fusion": round(fusion_time, 4),
+                "retrieval": round(time.perf_counter() - start, 4)
+            }
+            outputs[i]["cache"] = {"retrieval": "miss"}
+
+        return outputs
+
+    # --------------------------------------------------
+    # LLM GENERATION
+    # --------------------------------------------------
+
+    def _generate_batch(self, prompts):
+        """
+        Answers for several prompts: one padded generate call, or via
+        the generation batcher, shared with other threads' prompts.
+        """
+
+        batcher = self._component("gen_batcher")
+
+        if batcher is None:
+            return self._generate_padded(prompts)
+
+        return batcher.map(prompts)
+
+    def _generate_padded(self, prompts):
+        """Generate answers for several prompts in one padded generate call."""
+
+        torch = _import_torch()
+
+        inputs = self.gen_tokenizer(
+            prompts,
             return_tensors="pt",
+            padding=True,
             truncation=True,
-            max_length=1024
+            max_length=GEN_MAX_INPUT_LENGTH
         )
 
         with torch.no_grad():
 
-            outputs = gen_model.generate(
+            outputs = self.gen_model.generate(
                 inputs["input_ids"],
-                max_new_tokens=150,
-                num_beams=2,
-                do_sample=False
+                attention_mask=inputs["attention_mask"],
+                **GEN_CONFIG
             )
 
-        answer = gen_tokenizer.decode(
-            outputs[0],
+        return self.gen_tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def _generate_stream(self, prompt):
+        """
+        Yield answer text pieces as they are decoded. generate runs in a
+        background thread and feeds a TextIteratorStreamer.
+        """
+
+        torch = _import_torch()
+        from transformers import TextIteratorStreamer
+
+        gen_tokenizer, gen_model = self._component("generator")
+
+        inputs = gen_tokenizer(
+            prompt,
+            return_tensors="pt",
+            truncation=True,
+            max_length=GEN_MAX_INPUT_LENGTH
+        )
+
+        streamer = TextIteratorStreamer(
+            gen_tokenizer,
+            skip_prompt=True,
             skip_special_tokens=True
         )
 
-    else:
-        answer = "No relevant answer found."
+        errors = []
 
+        def worker():
 
-    # ==================================================
-    # ---------------- FINAL RETURN --------------------
-    # ==================================================
+            try:
+                with torch.no_grad():
+                    gen_model.generate(
+                        inputs["input_ids"],
+                        attention_mask=inputs["attention_mask"],
+                        streamer=streamer,
+                        **STREAM_GEN_CONFIG
+                    )
+            except Exception as exc:
+                errors.append(exc)
+                # unblock the consumer
+                streamer.end()
 
-    return {
-        "answer": answer,
-        "sources": sources,
-        "mode": mode,
-
-        # Final context
-        "final_context": final_context,
-        "retrieved_chunks": final_context,
-
-        # Debug retrieval outputs
-        "dense_results": dense_results,
-        "sparse_results": sparse_results,
-        "rrf_results": rrf_results
-    }
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+
+        for text in streamer:
+            if text:
+                yield text
+
+        thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def _generate_answers(self, queries, contexts, use_cache=True):
+        """
+        Answers for (query, final_context) pairs: cached answers are
+        reused (unless use_cache=False), the rest go through one padded
+        generate call with each distinct (query, chunks) prompt once.
+        Returns (answers, cache statuses, generation seconds).
+        """
+
+        answers = [None] * len(queries)
+        statuses = [None] * len(queries)
+
+        # pairs with the same query and chunks share one answer
+        groups = {}
+
+        for i, (query, final_context) in enumerate(zip(queries, contexts)):
+
+            if not final_context:
+                answers[i] = "No relevant answer found."
+                continue
+
+            chunk_ids = tuple(item["chunk_id"] for item in final_context)
+            groups.setdefault((query, chunk_ids), []).append(i)
+
+        pending = []
+
+        for indexes in groups.values():
+
+            i = indexes[0]
+            answer_key = None
+            cached = None
+
+            if use_cache:
+                answer_key = self._answer_key(queries[i], contexts[i])
+                cached = self._cache_get(answer_key)
+
+            for j in indexes:
+                answers[j] = cached
+                if use_cache:
+                    statuses[j] = "hit" if cached is not None else "miss"
+
+            if cached is None:
+                pending.append((indexes, answer_key))
+
+        generation_time = 0.0
+
+        if pending:
+
+            prompts = [
+                _build_prompt(queries[indexes[0]], [item["chunk"] for item in contexts[indexes[0]]])
+                for indexes, _ in pending
+            ]
+
+            generated, generation_time = _timed(self._generate_batch, prompts)
+
+            for (indexes, answer_key), answer in zip(pending, generated):
+
+                for j in indexes:
+                    answers[j] = answer
+
+                if answer_key is not None:
+                    self._cache_put(answer_key, answer)
+
+        return answers, statuses, generation_time
+
+    # --------------------------------------------------
+    # MAIN RAG PIPELINE
+    # --------------------------------------------------
+
+    def run_rag_batch(self, queries, mode="hybrid", top_k=10, final_k=5, nprobe=None,
+                      ef_search=None, generate=True, rrf_k=RRF_K):
+        """
+        Batched run_rag: retrieval for all queries together (see
+        retrieve_batch), then one padded generate call for every query
+        that found context. Returns a list of run_rag-style dicts.
+
+        Cached retrievals and answers are reused; each result reports
+        them in "cache" ({"retrieval": "hit"/"miss", "answer": ...}).
+        With the semantic cache enabled, a near-duplicate of an earlier
+        question returns its result directly ("cache": {"semantic": "hit"}).
+
+        generate=False skips generation and returns retrieve_batch's results.
+        """
+
+        if not generate:
+            return self.retrieve_batch(queries, mode, top_k, final_k, nprobe, ef_search, rrf_k)
+
+        semantic_cache = self.semantic_cache
+
+        if semantic_cache is None:
+            return self._answer_batch(queries, mode, top_k, final_k, nprobe, ef_search, rrf_k)
+
+        start = time.perf_counter()
+
+        config_key = self._retrieval_key("", mode, top_k, final_k, nprobe, ef_search, rrf_k)
+
+        outputs = [None] * len(queries)
+        embeddings = {}
+
+        live = [i for i, q in enumerate(queries) if q.strip()]
+
+        if live:
+
+            for i, emb in zip(live, self.encode_queries([queries[i] for i in live])):
+
+                hit = semantic_cache.lookup(emb, config_key)
+
+                if hit is None:
+                    embeddings[i] = emb
+                    continue
+
+                outputs[i] = _semantic_result(hit, start)
+
+        todo = [i for i, out in enumerate(outputs) if out is None]
+
+        answered = self._answer_batch(
+            [queries[i] for i in todo], mode, top_k, final_k, nprobe, ef_search, rrf_k
+        )
+
+        for i, result in zip(todo, answered):
+
+            outputs[i] = result
+
+            if i in embeddings:
+                self._semantic_add(embeddings[i], config_key, queries[i], result)
+
+        return outputs
+
+    def _semantic_add(self, embedding, config_key, query, result):
+
+        self.semantic_cache.add(
+            embedding, config_key, query,
+            {k: v for k, v in result.items() if k not in ("timings", "cache")},
+            generated=bool(result.get("final_context"))
+        )
+
+    def _answer_batch(self, queries, mode, top_k, final_k, nprobe=None, ef_search=None,
+                      rrf_k=RRF_K):
+
+        start = time.perf_counter()
+
+        outputs = self.retrieve_batch(queries, mode, top_k, final_k, nprobe, ef_search, rrf_k)
+
+        live = [i for i, out in enumerate(outputs) if "answer" not in out]
+
+        answers, statuses, generation_time = self._generate_answers(
+            [queries[i] for i in live],
+            [outputs[i]["final_context"] for i in live]
+        )
+
+        for i, answer, status in zip(live, answers, statuses):
+
+            outputs[i]["answer"] = answer
+
+            if status is not None:
+                outputs[i]["cache"]["answer"] = status
+
+        total_time = time.perf_counter() - start
+
+        for out in outputs:
+
+            if "timings" in out:
+                out["timings"]["generation"] = round(generation_time, 4)
+                out["timings"]["total"] = round(total_time, 4)
+
+        # keep run_rag's key order: answer first
+        return [{"answer": out.pop("answer"), **out} for out in outputs]
+
+    # --------------------------------------------------
+    # TWO-PHASE API
+    # --------------------------------------------------
+
+    def retrieve(self, query, mode="hybrid", top_k=10, final_k=5, nprobe=None, ef_search=None,
+                 rrf_k=RRF_K):
+        """
+        Retrieval stage of run_rag: sources, final_context and the
+        dense / sparse / RRF rankings, without generating an answer.
+        Pass the result's final_context to generate() for the answer.
+        """
+
+        return self.retrieve_batch([query], mode, top_k, final_k, nprobe, ef_search, rrf_k)[0]
+
+    def generate(self, query, final_context):
+        """
+        Generation stage of run_rag: the answer for query from the
+        retrieved final_context (cached like run_rag's answers).
+        """
+
+        answers, _, _ = self._generate_answers([query], [final_context])
+
+        return answers[0]
+
+    def run_rag(self, query, mode="hybrid", top_k=10, final_k=5, nprobe=None, ef_search=None,
+                generate=True, rrf_k=RRF_K):
+        """
+        nprobe / ef_search: search-time recall vs latency knobs for
+        IVF and HNSW indexes (ignored for flat). Defaults come from
+        the index metadata.
+
+        generate=False: retrieval only (same as retrieve()); the result
+        has no "answer".
+
+        rrf_k: RRF smoothing constant for hybrid mode.
+        """
+
+        return self.run_rag_batch(
+            [query], mode, top_k, final_k, nprobe, ef_search, generate, rrf_k
+        )[0]
+
+    def run_rag_modes(self, query, modes=("dense", "sparse", "hybrid"), top_k=10, final_k=5,
+                      nprobe=None, ef_search=None, generate=True, rrf_k=RRF_K, use_cache=True):
+        """
+        run_rag for several modes of one query. Dense and sparse retrieval
+        run once and every mode's ranking is derived from their results.
+        Returns {mode: run_rag-style result}.
+
+        Each mode's timings report what running it alone costs: its own
+        retriever for dense / sparse; for hybrid, max(dense, sparse) +
+        fusion with parallel retrieval, otherwise their sum. Retrieval
+        always runs (no retrieval cache) so the latencies are measured.
+        With generate=True, each distinct final context is answered by
+        its own generate call, whose time is that mode's "generation"
+        (modes with the same context share the answer and its time).
+        use_cache=False also skips the answer cache, so generation is
+        always timed.
+        """
+
+        if not query.strip():
+            return {mode: _empty_result(mode) for mode in modes}
+
+        run_dense = any(mode != "sparse" for mode in modes)
+        run_sparse = any(mode != "dense" for mode in modes)
+
+        dense_batch, sparse_batch, stage_timings = self._run_retrievers(
+            [query],
+            "hybrid" if run_dense and run_sparse else ("dense" if run_dense else "sparse"),
+            top_k, nprobe, ef_search
+        )
+
+        outputs = {}
+
+        for mode in modes:
+
+            result, fusion_time = self._mode_result(
+                mode, dense_batch[0], sparse_batch[0], final_k, rrf_k
+            )
+
+            dense_time = stage_timings["dense"] if mode != "sparse" else 0.0
+            sparse_time = stage_timings["sparse"] if mode != "dense" else 0.0
+
+            if self.config.parallel_retrieval:
+                retrieval_time = max(dense_time, sparse_time) + fusion_time
+            else:
+                retrieval_time = dense_time + sparse_time + fusion_time
+
+            result["timings"] = {
+                "dense": dense_time,
+                "sparse": sparse_time,
+                "fusion": round(fusion_time, 4),
+                "retrieval": round(retrieval_time, 4)
+            }
+            result["cache"] = {"retrieval": "miss"}
+
+            outputs[mode] = result
+
+        if not generate:
+            return outputs
+
+        answered = {}
+
+        for mode in modes:
+
+            result = outputs[mode]
+            final_context = result["final_context"]
+            chunk_ids = tuple(item["chunk_id"] for item in final_context)
+
+            if chunk_ids not in answered:
+                answered[chunk_ids] = self._generate_answers([query], [final_context], use_cache)
+
+            (answer,), (status,), generation_time = answered[chunk_ids]
+
+            if status is not None:
+                result["cache"]["answer"] = status
+
+            result["timings"]["generation"] = round(generation_time, 4)
+            result["timings"]["total"] = round(result["timings"]["retrieval"] + generation_time, 4)
+
+            outputs[mode] = {"answer": answer, **result}
+
+        return outputs
+
+    def run_rag_stream(self, query, mode="hybrid", top_k=10, final_k=5, nprobe=None,
+                       ef_search=None, rrf_k=RRF_K):
+        """
+        Streaming run_rag. Yields event dicts:
+
+          {"type": "retrieval", "result": ...}  retrieval fields, before generation
+          {"type": "token", "text": ...}        answer text as it is decoded
+          {"type": "done", "result": ...}       full run_rag-style result
+
+        Generation is greedy (STREAM_GEN_CONFIG). The final timings add
+        time_to_retrieval and time_to_first_token next to total.
+
+        With the semantic cache enabled, a near-duplicate of an earlier
+        question (streamed or not) is answered from it without
+        retrieval or generation, and new answers are added to it.
+        """
+
+        start = time.perf_counter()
+
+        semantic_cache = self.semantic_cache
+        embedding = None
+
+        if semantic_cache is not None and query.strip():
+
+            config_key = self._retrieval_key("", mode, top_k, final_k, nprobe, ef_search, rrf_k)
+            embedding = self.encode_queries([query])[0]
+            hit = semantic_cache.lookup(embedding, config_key)
+
+            if hit is not None:
+                result = _semantic_result(hit, start)
+                yield {"type": "retrieval", "result": {
+                    k: v for k, v in result.items() if k != "answer"
+                }}
+                yield {"type": "token", "text": result["answer"]}
+                yield {"type": "done", "result": result}
+                return
+
+        result = self.retrieve(query, mode, top_k, final_k, nprobe, ef_search, rrf_k)
+        time_to_retrieval = time.perf_counter() - start
+
+        yield {"type": "retrieval", "result": result}
+
+        if "answer" in result:
+            yield {"type": "done", "result": result}
+            return
+
+        answer = None
+        answer_key = None
+        time_to_first_token = None
+
+        if result["final_context"]:
+
+            answer_key = self._answer_key(query, result["final_context"], STREAM_GEN_CONFIG)
+            answer = self._cache_get(answer_key)
+            result["cache"]["answer"] = "miss" if answer is None else "hit"
+
+        if answer is None and answer_key is not None:
+
+            prompt = _build_prompt(query, [item["chunk"] for item in result["final_context"]])
+            pieces = []
+
+            for text in self._generate_stream(prompt):
+
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+
+                pieces.append(text)
+                yield {"type": "token", "text": text}
+
+            answer = "".join(pieces).strip()
+            self._cache_put(answer_key, answer)
+
+        else:
+
+            answer = answer or "No relevant answer found."
+            time_to_first_token = time.perf_counter() - start
+            yield {"type": "token", "text": answer}
+
+        total_time = time.perf_counter() - start
+
+        if time_to_first_token is None:
+            time_to_first_token = total_time
+
+        result["timings"]["time_to_retrieval"] = round(time_to_retrieval, 4)
+        result["timings"]["time_to_first_token"] = round(time_to_first_token, 4)
+        result["timings"]["total"] = round(total_time, 4)
+
+        result = {"answer": answer, **result}
+
+        if embedding is not None:
+            self._semantic_add(embedding, config_key, query, result)
+
+        yield {"type": "done", "result": result}
+
+
+# ======================================================
+# ---------------- DEFAULT ENGINE ----------------------
+# ======================================================
+
+# The module-level functions below run on one shared engine configured
+# from the environment, created on first call - nothing loads at import.
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide RAGEngine behind the module-level functions."""
+
+    global _default_engine
+
+    with _default_engine_lock:
+
+        if _default_engine is None:
+            _default_engine = RAGEngine(RAGConfig.from_env())
+
+    return _default_engine
+
+
+def _delegate(name):
+
+    def function(*args, **kwargs):
+        return getattr(get_engine(), name)(*args, **kwargs)
+
+    function.__name__ = name
+    function.__qualname__ = name
+    function.__doc__ = getattr(RAGEngine, name).__doc__
+
+    return function
+
+
+retrieve_batch = _delegate("retrieve_batch")
+run_rag_batch = _delegate("run_rag_batch")
+retrieve = _delegate("retrieve")
+generate = _delegate("generate")
+run_rag = _delegate("run_rag")
+run_rag_modes = _delegate("run_rag_modes")
+run_rag_stream = _delegate("run_rag_stream")
+encode_queries = _delegate("encode_queries")
+encode_queries_async = _delegate("encode_queries_async")
+
+
+# module attributes that used to be loaded at import time
+_ENGINE_ATTRIBUTES = {
+    "corpus": "corpus",
+    "texts": "texts",
+    "bm25": "bm25",
+    "index": "index",
+    "index_meta": "index_meta",
+    "embed_model": "embed_model",
+    "query_cache": "query_cache",
+    "gen_tokenizer": "gen_tokenizer",
+    "gen_model": "gen_model",
+    "response_cache": "response_cache",
+    "semantic_cache": "semantic_cache",
+    "INDEX_VERSION": "index_version"
+}
+
+
+def __getattr__(name):
+
+    if name in _ENGINE_ATTRIBUTES:
+        return getattr(get_engine(), _ENGINE_ATTRIBUTES[name])
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
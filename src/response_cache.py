@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# ======================================================
+# ---------------- RESPONSE CACHE ----------------------
+# ======================================================
+
+class ResponseCache:
+    """
+    Two-level cache for JSON-serializable values:
+    an in-memory LRU in front of an optional SQLite file.
+
+    version: everything stored under a different version is dropped
+    when the cache is opened (e.g. after the indexes are rebuilt).
+    Values are stored as JSON text, so every get() returns a fresh
+    copy that callers may modify.
+    """
+
+    def __init__(self, path=None, maxsize=1024, version=""):
+
+        self.path = path
+        self.maxsize = maxsize
+        self.version = version
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self._open_db()
+
+    @staticmethod
+    def make_key(*parts):
+        """Stable hash of any JSON-serializable key parts."""
+
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # --------------------------------------------------
+    # SQLITE
+    # --------------------------------------------------
+
+    def _open_db(self):
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+        # WAL lets several worker processes read while one writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+
+        if row is None or row[0] != self.version:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)",
+                (self.version,)
+            )
+
+        self._db.commit()
+
+    # --------------------------------------------------
+    # GET / PUT
+    # --------------------------------------------------
+
+    def _remember(self, key, payload):
+
+        if self.maxsize <= 0:
+            return
+
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached value for key, or None."""
+
+        with self._lock:
+
+            payload = self._memory.get(key)
+
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(payload)
+
+            if self._db is not None:
+
+                row = self._db.execute(
+                    "SELECT value FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+
+        payload = json.dumps(value)
+
+        with self._lock:
+
+            self._remember(key, payload)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, payload, time.time())
+                )
+                self._db.commit()
+
+    def clear(self):
+
+        with self._lock:
+
+            self._memory.clear()
+
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def stats(self):
+
+        with self._lock:
+
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "maxsize": self.maxsize
+            }
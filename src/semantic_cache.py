@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+
+# ======================================================
+# ---------------- SEMANTIC QUERY CACHE ----------------
+# ======================================================
+
+class SemanticCache:
+    """
+    Answer cache for near-duplicate questions.
+
+    Previously answered queries are kept as normalized embeddings in a
+    small FAISS inner-product index. A new query whose cosine similarity
+    to a cached one is >= threshold (and was asked with the same
+    pipeline config) gets the cached result back, skipping retrieval
+    and generation.
+
+    Entries expire after ttl seconds; past maxsize the oldest entry is
+    evicted.
+    """
+
+    def __init__(self, dim, threshold=0.92, maxsize=1000, ttl=3600, candidates=8):
+
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.candidates = candidates
+
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+        # id -> entry, oldest first (insertion order = expiry order)
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.expired = 0
+        self.evicted = 0
+        self.generations_saved = 0
+
+    # --------------------------------------------------
+    # EVICTION
+    # --------------------------------------------------
+
+    def _remove(self, ids):
+
+        for entry_id in ids:
+            del self._entries[entry_id]
+
+        self.index.remove_ids(np.asarray(ids, dtype="int64"))
+
+    def _purge_expired(self, now):
+
+        expired = []
+
+        for entry_id, entry in self._entries.items():
+            if now - entry["created_at"] < self.ttl:
+                break
+            expired.append(entry_id)
+
+        if expired:
+            self._remove(expired)
+            self.expired += len(expired)
+
+    # --------------------------------------------------
+    # LOOKUP / ADD
+    # --------------------------------------------------
+
+    def lookup(self, embedding, config_key):
+        """
+        embedding: normalized query vector (d,)
+        Returns (value, similarity, matched query) or None.
+        """
+
+        with self._lock:
+
+            self.lookups += 1
+            self._purge_expired(time.time())
+
+            if self.index.ntotal == 0:
+                return None
+
+            k = min(self.candidates, self.index.ntotal)
+            scores, ids = self.index.search(
+                np.asarray(embedding, dtype="float32").reshape(1, -1), k
+            )
+
+            for score, entry_id in zip(scores[0], ids[0]):
+
+                if score < self.threshold:
+                    break
+
+                entry = self._entries.get(int(entry_id))
+
+                if entry is None or entry["config_key"] != config_key:
+                    continue
+
+                self.hits += 1
+                if entry["generated"]:
+                    self.generations_saved += 1
+
+                return json.loads(entry["value"]), float(score), entry["query"]
+
+            return None
+
+    def add(self, embedding, config_key, query, value, generated=True):
+        """
+        value: JSON-serializable result to return on future hits
+        generated: whether producing value needed an LLM generation
+        """
+
+        with self._lock:
+
+            entry_id = self._next_id
+            self._next_id += 1
+
+            self.index.add_with_ids(
+                np.asarray(embedding, dtype="float32").reshape(1, -1),
+                np.array([entry_id], dtype="int64")
+            )
+
+            self._entries[entry_id] = {
+                "query": query,
+                "config_key": config_key,
+                "value": json.dumps(value),
+                "generated": generated,
+                "created_at": time.time()
+            }
+
+            overflow = len(self._entries) - self.maxsize
+            if overflow > 0:
+                self._remove(list(self._entries)[:overflow])
+                self.evicted += overflow
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "generations_saved": self.generations_saved,
+                "size": len(self._entries),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "threshold": self.threshold
+            }
@@ -0,0 +1,862 @@
+"""
+RAG HTTP Service: a local JSON API in front of a pool of worker
+processes, each holding a loaded RAGEngine.
+
+  GET  /health          worker status
+  GET  /metrics         request counts, latency percentiles, queue depth
+  POST /retrieve        {"query", "mode", "top_k", "final_k", ...} -> retrieve()
+  POST /generate        {"query", "final_context"} -> {"answer"}
+  POST /answer          same fields as /retrieve -> run_rag()
+  POST /answer/stream   same fields -> run_rag_stream() events as NDJSON
+
+Each worker serves --worker-threads requests at once; with more than
+one, their query encodings and generate calls are micro-batched
+(RAG_EMBED_BATCH_* / RAG_GEN_BATCH_*, stats under /metrics).
+
+Requests wait for an idle worker (up to --max-queue waiting, then 503)
+and fail with 504 after their timeout (default --timeout, or a smaller
+"timeout" in the body). A timed-out request still occupies its worker
+until the worker finishes it. Workers that die are restarted; ones that
+keep failing to start are retried with backoff, then reported as
+failed under /health.
+
+Run: python src/server.py --workers 2 --port 8000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+# ======================================================
+# ---------------- CONFIGURATION -----------------------
+# ======================================================
+
+HOST = os.environ.get("RAG_SERVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("RAG_SERVER_PORT", "8000"))
+WORKERS = int(os.environ.get("RAG_SERVER_WORKERS", "2"))
+WORKER_THREADS = int(os.environ.get("RAG_SERVER_WORKER_THREADS", "1"))
+MAX_QUEUE = int(os.environ.get("RAG_SERVER_MAX_QUEUE", "64"))
+REQUEST_TIMEOUT = float(os.environ.get("RAG_SERVER_TIMEOUT", "120"))
+
+MAX_BODY_BYTES = 1 << 20
+
+MODES = ("dense", "sparse", "hybrid")
+
+# request fields passed through to the engine
+RETRIEVAL_PARAMS = ("query", "mode", "top_k", "final_k", "nprobe", "ef_search", "rrf_k")
+
+# the ones that must be positive integers
+INT_PARAMS = ("top_k", "final_k", "nprobe", "ef_search", "rrf_k")
+
+# latencies kept per endpoint for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+
+# Workers that die before becoming ready (e.g. a missing index) are
+# restarted after 1, 2, 4, ... seconds (at most RESTART_BACKOFF_MAX);
+# after MAX_STARTUP_FAILURES in a row the server stops restarting them.
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 30.0
+MAX_STARTUP_FAILURES = 5
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ======================================================
+# ---------------- WORKER PROCESS ----------------------
+# ======================================================
+
+def _run_task(engine, op, params, emit):
+
+    if op == "retrieve":
+        return engine.retrieve(**params)
+
+    if op == "generate":
+        return {"answer": engine.generate(params["query"], params["final_context"])}
+
+    if op == "answer":
+        return engine.run_rag(**params)
+
+    if op == "answer_stream":
+        for event in engine.run_rag_stream(**params):
+            emit(event)
+        return None
+
+    raise ValueError(f"Unknown operation: {op}")
+
+
+def _serve_task(engine, worker_id, task, results):
+
+    request_id, op, params = task
+
+    def emit(event):
+        results.put((worker_id, request_id, "event", event))
+
+    try:
+        results.put((worker_id, request_id, "done", _run_task(engine, op, params, emit)))
+    except Exception as exc:
+        results.put((worker_id, request_id, "error", f"{type(exc).__name__}: {exc}"))
+
+
+def _worker_main(worker_id, tasks, results, threads=1):
+    """
+    Load an engine (RAG_* settings), then serve tasks until None,
+    up to threads at a time.
+    """
+
+    # the server handles Ctrl+C and shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from src.rag_pipeline import RAGConfig, RAGEngine
+
+    overrides = {}
+
+    # concurrent requests in one worker share batched query-encoding
+    # and generate calls
+    if threads > 1 and "RAG_EMBED_BATCHING" not in os.environ:
+        overrides["embed_batching"] = True
+
+    if threads > 1 and "RAG_GEN_BATCHING" not in os.environ:
+        overrides["gen_batching"] = True
+
+    try:
+        engine = RAGEngine(RAGConfig.from_env(**overrides)).load()
+    except Exception as exc:
+        # reported under /health while the server retries
+        results.put((worker_id, None, "failed", f"{type(exc).__name__}: {exc}"))
+        raise
+
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="rag-task")
+
+    results.put((worker_id, None, "ready", threads))
+
+    parent = mp.parent_process()
+
+    while True:
+
+        try:
+            task = tasks.get(timeout=1.0)
+        except queue.Empty:
+            # exit if the server died without shutting us down
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+
+        if task is None:
+            break
+
+        request_id, op, _ = task
+
+        # answered right away, even while every task thread is busy
+        if op == "stats":
+            results.put((worker_id, request_id, "done", engine.stats()))
+            continue
+
+        executor.submit(_serve_task, engine, worker_id, task, results)
+
+    executor.shutdown(wait=True)
+
+
+class _Worker:
+
+    def __init__(self, worker_id, ctx, results, threads=1):
+
+        self.id = worker_id
+        self.threads = threads
+        self.tasks = ctx.Queue()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.tasks, results, threads),
+            name=f"rag-worker-{worker_id}",
+            daemon=True
+        )
+        self.process.start()
+
+        self.ready = False
+        self.error = None
+        self.request_ids = set()
+        self.started_at = time.time()
+        self.completed = 0
+
+
+# ======================================================
+# ---------------- SERVER ------------------------------
+# ======================================================
+
+class RAGServer:
+    """asyncio HTTP front end dispatching requests to worker processes."""
+
+    def __init__(self, workers=WORKERS, max_queue=MAX_QUEUE, timeout=REQUEST_TIMEOUT,
+                 worker_threads=WORKER_THREADS):
+
+        self.num_workers = workers
+        self.worker_threads = worker_threads
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._workers = {}
+        self._worker_ids = itertools.count()
+        self._request_ids = itertools.count()
+
+        self._loop = None
+        self._idle = None
+        self._reader = None
+        self._pending = {}
+        self._control = set()
+        self._waiting = 0
+
+        self._started_at = time.time()
+        self._counts = {}
+        self._latencies = {}
+        self._queue_waits = deque(maxlen=LATENCY_WINDOW)
+        self._restarts = 0
+
+        # worker startup failures in a row, restarts waiting on their
+        # backoff, workers given up on, and the last worker exit
+        self._startup_failures = 0
+        self._pending_restarts = 0
+        self._abandoned = 0
+        self._last_exit = None
+
+    # --------------------------------------------------
+    # WORKER POOL
+    # --------------------------------------------------
+
+    def _start_worker(self):
+
+        worker = _Worker(next(self._worker_ids), self._ctx, self._results, self.worker_threads)
+        self._workers[worker.id] = worker
+
+    def _read_results(self):
+        """Thread: hand worker messages to the event loop."""
+
+        while True:
+
+            try:
+                message = self._results.get()
+            except (EOFError, OSError):
+                break  # queue closed under us at exit
+
+            if message is None:
+                break
+
+            try:
+                self._loop.call_soon_threadsafe(self._on_message, message)
+            except RuntimeError:
+                break  # event loop already closed (shutting down)
+
+    def _on_message(self, message):
+
+        worker_id, request_id, kind, payload = message
+        worker = self._workers.get(worker_id)
+
+        if worker is None:
+            return  # from a worker that has been replaced
+
+        if kind == "ready":
+            # one idle slot per task thread
+            worker.ready = True
+            self._startup_failures = 0
+            for _ in range(payload):
+                self._idle.put_nowait(worker_id)
+            return
+
+        if kind == "failed":
+            worker.error = payload
+            return
+
+        messages = self._pending.get(request_id)
+        if messages is not None:
+            messages.put_nowait((kind, payload))
+
+        if kind in ("done", "error"):
+
+            self._pending.pop(request_id, None)
+
+            if request_id in self._control:
+                self._control.discard(request_id)
+                return
+
+            worker.request_ids.discard(request_id)
+            worker.completed += 1
+            self._idle.put_nowait(worker_id)
+
+    def _restart_worker(self):
+
+        self._pending_restarts -= 1
+        self._start_worker()
+
+    async def _monitor_workers(self):
+        """
+        Replace workers whose process exited and fail their requests.
+        Workers that keep dying during startup are restarted with
+        backoff, then given up on (reported by /health).
+        """
+
+        while True:
+
+            await asyncio.sleep(1.0)
+
+            for worker in list(self._workers.values()):
+
+                if worker.process.is_alive():
+                    continue
+
+                del self._workers[worker.id]
+
+                for request_id in worker.request_ids:
+                    messages = self._pending.pop(request_id, None)
+                    if messages is not None:
+                        messages.put_nowait(("error", "worker process exited"))
+
+                self._last_exit = {
+                    "worker": worker.id,
+                    "exit_code": worker.process.exitcode,
+                    "during_startup": not worker.ready,
+                    "error": worker.error,
+                    "at": time.time()
+                }
+
+                if worker.ready:
+                    delay = 0.0
+                else:
+                    self._startup_failures += 1
+                    delay = min(
+                        RESTART_BACKOFF * 2 ** (self._startup_failures - 1), RESTART_BACKOFF_MAX
+                    )
+
+                if self._startup_failures >= MAX_STARTUP_FAILURES:
+                    self._abandoned += 1
+                    print(f"Worker {worker.id} failed to start (code {worker.process.exitcode}) "
+                          f"{self._startup_failures} times in a row, not restarting")
+                    continue
+
+                print(f"Worker {worker.id} exited (code {worker.process.exitcode}), "
+                      f"restarting in {delay:g}s")
+
+                self._restarts += 1
+                self._pending_restarts += 1
+                self._loop.call_later(delay, self._restart_worker)
+
+    async def _acquire_worker(self, deadline):
+
+        if not self._workers and not self._pending_restarts:
+            raise HTTPError(503, "no workers available (see /health)")
+
+        # an idle worker takes the request without queueing
+        while not self._idle.empty():
+            worker_id = self._idle.get_nowait()
+            if worker_id in self._workers:
+                return worker_id
+
+        if self._waiting >= self.max_queue:
+            raise HTTPError(503, "request queue is full")
+
+        self._waiting += 1
+        getter = asyncio.ensure_future(self._idle.get())
+
+        try:
+
+            while True:
+
+                remaining = deadline - self._loop.time()
+
+                try:
+                    worker_id = await asyncio.wait_for(asyncio.shield(getter), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    # the worker id stays in the queue unless get() already returned it
+                    if not getter.cancel():
+                        self._idle.put_nowait(getter.result())
+                    raise HTTPError(504, "timed out waiting for a worker")
+
+                # skip ids of workers replaced while they sat in the queue
+                if worker_id in self._workers:
+                    return worker_id
+
+                getter = asyncio.ensure_future(self._idle.get())
+
+        finally:
+            self._waiting -= 1
+
+    async def _submit(self, op, params, timeout):
+        """Queue a task -> (message queue, deadline)."""
+
+        start = self._loop.time()
+        deadline = start + timeout
+
+        worker_id = await self._acquire_worker(deadline)
+        self._queue_waits.append(self._loop.time() - start)
+
+        request_id = next(self._request_ids)
+        messages = asyncio.Queue()
+
+        self._pending[request_id] = messages
+        self._workers[worker_id].request_ids.add(request_id)
+        self._workers[worker_id].tasks.put((request_id, op, params))
+
+        return request_id, messages, deadline
+
+    async def _next_message(self, request_id, messages, deadline):
+
+        try:
+            kind, payload = await asyncio.wait_for(
+                messages.get(), max(deadline - self._loop.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            # late messages for this request are dropped
+            self._pending.pop(request_id, None)
+            raise HTTPError(504, "request timed out")
+
+        if kind == "error":
+            raise HTTPError(500, payload)
+
+        return kind, payload
+
+    # --------------------------------------------------
+    # REQUEST PARSING
+    # --------------------------------------------------
+
+    def _timeout(self, body):
+
+        timeout = body.get("timeout", self.timeout)
+
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0:
+            raise HTTPError(400, "timeout must be a positive number")
+
+        return min(float(timeout), self.timeout)
+
+    @staticmethod
+    def _retrieval_params(body):
+
+        query = body.get("query")
+
+        if not isinstance(query, str):
+            raise HTTPError(400, "query must be a string")
+
+        if body.get("mode", "hybrid") not in MODES:
+            raise HTTPError(400, f"mode must be one of: {', '.join(MODES)}")
+
+        for name in INT_PARAMS:
+
+            value = body.get(name)
+
+            if value is not None and (
+                not isinstance(value, int) or isinstance(value, bool) or value < 1
+            ):
+                raise HTTPError(400, f"{name} must be a positive integer")
+
+        return {name: body[name] for name in RETRIEVAL_PARAMS if body.get(name) is not None}
+
+    @staticmethod
+    def _generate_params(body):
+
+        if not isinstance(body.get("query"), str) or not isinstance(body.get("final_context"), list):
+            raise HTTPError(400, "query (string) and final_context (list) are required")
+
+        # items as returned by /retrieve
+        for item in body["final_context"]:
+            if not (isinstance(item, dict) and isinstance(item.get("chunk"), str)
+                    and isinstance(item.get("chunk_id"), int)
+                    and not isinstance(item.get("chunk_id"), bool)):
+                raise HTTPError(400, "final_context items must be objects with "
+                                     "chunk (string) and chunk_id (integer)")
+
+        return {"query": body["query"], "final_context": body["final_context"]}
+
+    # --------------------------------------------------
+    # ENDPOINTS
+    # --------------------------------------------------
+
+    def health(self):
+
+        ready = sum(worker.ready for worker in self._workers.values())
+
+        if not self._workers and not self._pending_restarts:
+            status = "failed"
+        elif self._startup_failures or self._abandoned:
+            status = "degraded" if ready else "failing"
+        else:
+            status = "ok" if ready else "starting"
+
+        return {
+            "status": status,
+            "workers": len(self._workers),
+            "ready_workers": ready,
+            "restarting_workers": self._pending_restarts,
+            "failed_workers": self._abandoned,
+            "startup_failures": self._startup_failures,
+            "last_worker_exit": self._last_exit,
+            "busy_workers": sum(bool(w.request_ids) for w in self._workers.values()),
+            "active_requests": sum(len(w.request_ids) for w in self._workers.values()),
+            "waiting_requests": self._waiting
+        }
+
+    async def _worker_stats(self, worker, timeout=1.0):
+        """The worker engine's cache / batching stats (None if it is slow)."""
+
+        request_id = next(self._request_ids)
+        messages = asyncio.Queue()
+
+        self._pending[request_id] = messages
+        self._control.add(request_id)
+        worker.tasks.put((request_id, "stats", None))
+
+        try:
+            _, stats = await self._next_message(
+                request_id, messages, self._loop.time() + timeout
+            )
+            return stats
+        except HTTPError:
+            return None
+
+    async def metrics(self):
+
+        workers = [w for w in self._workers.values() if w.ready]
+        engine_stats = await asyncio.gather(*(self._worker_stats(w) for w in workers))
+
+        endpoints = {}
+
+        for path, counts in self._counts.items():
+
+            latencies = sorted(self._latencies.get(path, ()))
+
+            endpoints[path] = {
+                **counts,
+                "latency_p50": _percentile(latencies, 50),
+                "latency_p95": _percentile(latencies, 95),
+                "latency_max": round(latencies[-1], 4) if latencies else None
+            }
+
+        queue_waits = sorted(self._queue_waits)
+
+        return {
+            "uptime_sec": round(time.time() - self._started_at, 1),
+            **self.health(),
+            "max_queue": self.max_queue,
+            "timeout_sec": self.timeout,
+            "worker_threads": self.worker_threads,
+            "worker_restarts": self._restarts,
+            "queue_wait_p50": _percentile(queue_waits, 50),
+            "queue_wait_p95": _percentile(queue_waits, 95),
+            "workers_detail": [
+                {
+                    "id": worker.id,
+                    "pid": worker.process.pid,
+                    "active_requests": len(worker.request_ids),
+                    "completed": worker.completed,
+                    # caches and the generation batcher (throughput, queue wait)
+                    "engine": stats
+                }
+                for worker, stats in zip(workers, engine_stats)
+            ],
+            "endpoints": endpoints
+        }
+
+    async def _call(self, op, params, timeout):
+
+        request_id, messages, deadline = await self._submit(op, params, timeout)
+        _, result = await self._next_message(request_id, messages, deadline)
+
+        return result
+
+    async def _stream(self, writer, params, timeout):
+        """Write run_rag_stream events as chunked NDJSON."""
+
+        request_id, messages, deadline = await self._submit("answer_stream", params, timeout)
+
+        # errors before the first event still get a normal status code
+        kind, payload = await self._next_message(request_id, messages, deadline)
+
+        writer.write(_head(200, "application/x-ndjson", chunked=True))
+
+        while True:
+
+            if kind == "event":
+                _write_chunk(writer, (json.dumps(payload) + "\n").encode("utf-8"))
+                await writer.drain()
+            else:
+                break
+
+            try:
+                kind, payload = await self._next_message(request_id, messages, deadline)
+            except HTTPError as exc:
+                error = {"type": "error", "status": exc.status, "error": exc.message}
+                _write_chunk(writer, (json.dumps(error) + "\n").encode("utf-8"))
+                break
+
+        _write_chunk(writer, b"")
+
+    async def _route(self, method, path, body, writer):
+
+        if path in ("/health", "/metrics"):
+
+            if method != "GET":
+                raise HTTPError(405, f"method {method} not allowed for {path}")
+
+            return 200, self.health() if path == "/health" else await self.metrics()
+
+        routes = {
+            "/retrieve": ("retrieve", self._retrieval_params),
+            "/generate": ("generate", self._generate_params),
+            "/answer": ("answer", self._retrieval_params),
+            "/answer/stream": ("answer_stream", self._retrieval_params)
+        }
+
+        if path not in routes:
+            raise HTTPError(404, f"unknown endpoint: {path}")
+
+        if method != "POST":
+            raise HTTPError(405, f"method {method} not allowed for {path}")
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            raise HTTPError(400, "body must be JSON")
+
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+
+        op, parse = routes[path]
+        params = parse(payload)
+        timeout = self._timeout(payload)
+
+        if op == "answer_stream":
+            await self._stream(writer, params, timeout)
+            return None
+
+        return 200, await self._call(op, params, timeout)
+
+    async def _handle(self, reader, writer):
+
+        start = time.perf_counter()
+        path = None
+        status = 500
+
+        try:
+
+            request_line = await reader.readline()
+
+            if not request_line.strip():
+                return
+
+            try:
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            except ValueError:
+                raise HTTPError(400, "malformed request line")
+
+            path = target.split("?", 1)[0]
+            headers = {}
+
+            while True:
+
+                line = await reader.readline()
+
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                length = int(headers.get("content-length", "0") or 0)
+            except ValueError:
+                raise HTTPError(400, "invalid Content-Length") from None
+
+            if length < 0:
+                raise HTTPError(400, "invalid Content-Length")
+
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(413, "request body too large")
+
+            body = await reader.readexactly(length) if length else b""
+
+            response = await self._route(method.upper(), path, body, writer)
+
+            if response is None:
+                status = 200  # streamed
+            else:
+                status, payload = response
+                _write_json(writer, status, payload)
+
+        except HTTPError as exc:
+            status = exc.status
+            _write_json(writer, status, {"error": exc.message})
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            status = 499
+
+        except Exception as exc:
+            status = 500
+            _write_json(writer, status, {"error": f"{type(exc).__name__}: {exc}"})
+
+        finally:
+
+            if path is not None:
+                self._record(path, status, time.perf_counter() - start)
+
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _record(self, path, status, seconds):
+
+        counts = self._counts.setdefault(
+            path, {"requests": 0, "errors": 0, "timeouts": 0, "rejected": 0}
+        )
+
+        counts["requests"] += 1
+
+        if status == 504:
+            counts["timeouts"] += 1
+        elif status == 503:
+            counts["rejected"] += 1
+        elif status >= 400:
+            counts["errors"] += 1
+
+        self._latencies.setdefault(path, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    # --------------------------------------------------
+    # LIFECYCLE
+    # --------------------------------------------------
+
+    async def serve(self, host=HOST, port=PORT):
+
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+
+        for _ in range(self.num_workers):
+            self._start_worker()
+
+        self._reader = threading.Thread(target=self._read_results, name="rag-results", daemon=True)
+        self._reader.start()
+
+        monitor = asyncio.ensure_future(self._monitor_workers())
+
+        # SIGTERM shuts down like Ctrl+C, workers included
+        self._loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        server = await asyncio.start_server(self._handle, host, port)
+
+        print(f"RAG server on http://{host}:{port} | workers: {self.num_workers} "
+              f"| max queue: {self.max_queue} | timeout: {self.timeout}s")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            monitor.cancel()
+            self.shutdown()
+
+    def shutdown(self):
+
+        for worker in self._workers.values():
+            worker.tasks.put(None)
+
+        for worker in self._workers.values():
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+        self._results.put(None)
+
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+
+
+# ======================================================
+# ---------------- HTTP HELPERS ------------------------
+# ======================================================
+
+def _percentile(sorted_values, q):
+
+    if not sorted_values:
+        return None
+
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+
+    return round(sorted_values[index], 4)
+
+
+def _head(status, content_type, length=None, chunked=False):
+
+    lines = [
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        f"Content-Type: {content_type}",
+        "Connection: close"
+    ]
+
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {length}")
+
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _write_json(writer, status, payload):
+
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(_head(status, "application/json", length=len(body)) + body)
+
+
+def _write_chunk(writer, data):
+
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+
+# ======================================================
+# ---------------- MAIN --------------------------------
+# ======================================================
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Serve the RAG engine over HTTP")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="engine processes")
+    parser.add_argument("--worker-threads", type=int, default=WORKER_THREADS,
+                        help="concurrent requests per worker; >1 batches their generation")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE,
+                        help="requests allowed to wait for a worker before 503")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help="seconds per request, including queueing")
+    args = parser.parse_args(argv)
+
+    server = RAGServer(
+        workers=args.workers,
+        max_queue=args.max_queue,
+        timeout=args.timeout,
+        worker_threads=args.worker_threads
+    )
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\nShutting down")
+
+
+if __name__ == "__main__":
+    main()
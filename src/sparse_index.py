@@ -0,0 +1,684 @@
+from collections import Counter
+from datetime import datetime
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+
+# ======================================================
+# ---------------- ON-DISK FORMAT ----------------------
+# ======================================================
+
+# A saved index is a directory of flat .npy arrays plus meta.json.
+# Bump FORMAT_VERSION whenever the layout or scoring changes;
+# load() refuses other versions instead of returning wrong scores.
+
+FORMAT_NAME = "bm25-csr"
+FORMAT_VERSION = 1
+
+BASE_ARRAYS = ("indptr", "doc_ids", "tfs", "doc_len", "idf")
+DERIVED_ARRAYS = (
+    "doc_norm", "bm_indptr", "bm_block", "bm_post", "bm_impact", "term_max_impact"
+)
+
+
+# ======================================================
+# ---------------- BM25 INVERTED INDEX -----------------
+# ======================================================
+
+class SparseIndex:
+    """
+    BM25 (Okapi) over an inverted index stored as CSR arrays.
+
+    For term id t, its postings are
+        doc_ids[indptr[t]:indptr[t + 1]]  (ascending doc ids)
+        tfs[indptr[t]:indptr[t + 1]]      (term frequency in that doc)
+
+    Scores are identical to rank_bm25.BM25Okapi with the same
+    k1 / b / epsilon, but a query only touches the postings of its
+    own terms instead of every document in the corpus.
+
+    Block-max metadata (for dynamic pruning) splits the doc id space
+    into blocks of block_size documents. For term t, entry j in
+    bm_indptr[t]:bm_indptr[t + 1] says the term occurs in block
+    bm_block[j], its postings there are bm_post[j]:bm_post[j + 1],
+    and the largest idf-free BM25 impact among them is bm_impact[j].
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, tfs, doc_len, idf, k1=1.5, b=0.75, epsilon=0.25,
+                 block_size=128, avgdl=None, derived=None):
+        """
+        avgdl / derived: precomputed values (as written by save) so a
+        loaded index does not touch every document at startup.
+        """
+
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.idf = idf
+
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.corpus_size = len(doc_len)
+        if avgdl is None:
+            avgdl = float(doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+        self.avgdl = avgdl
+
+        self.block_size = block_size
+        self.num_blocks = -(-self.corpus_size // block_size)
+
+        if derived is not None:
+            for name in DERIVED_ARRAYS:
+                setattr(self, name, derived[name])
+            return
+
+        # per-document length normalisation, precomputed once
+        self.doc_norm = self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
+        self._build_block_max()
+
+    # --------------------------------------------------
+    # BUILD
+    # --------------------------------------------------
+
+    @classmethod
+    def build(cls, tokenized_corpus, k1=1.5, b=0.75, epsilon=0.25, block_size=128):
+        """
+        tokenized_corpus: list of token lists (same input as BM25Okapi)
+        """
+
+        term_ids = {}
+        post_terms, post_docs, post_tfs = [], [], []
+        doc_len = np.zeros(len(tokenized_corpus), dtype=np.int64)
+
+        for doc_id, tokens in enumerate(tokenized_corpus):
+
+            doc_len[doc_id] = len(tokens)
+
+            for term, tf in Counter(tokens).items():
+                post_terms.append(term_ids.setdefault(term, len(term_ids)))
+                post_docs.append(doc_id)
+                post_tfs.append(tf)
+
+        post_terms = np.asarray(post_terms, dtype=np.int64)
+
+        # idf in first-seen term order: BM25Okapi averages idf in that
+        # order, and the epsilon floor depends on the exact average
+        first_seen_idf = cls._compute_idf(
+            np.bincount(post_terms, minlength=len(term_ids)),
+            len(tokenized_corpus),
+            epsilon
+        )
+
+        # renumber terms in sorted order, postings grouped by term
+        terms = sorted(term_ids)
+        remap = np.empty(len(terms), dtype=np.int64)
+        for new_id, term in enumerate(terms):
+            remap[term_ids[term]] = new_id
+
+        post_terms = remap[post_terms]
+        order = np.argsort(post_terms, kind="stable")
+
+        doc_ids = np.asarray(post_docs, dtype=np.int32)[order]
+        tfs = np.asarray(post_tfs, dtype=np.int32)[order]
+
+        df = np.bincount(post_terms, minlength=len(terms))
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+
+        idf = np.empty(len(terms), dtype=np.float64)
+        idf[remap] = first_seen_idf
+        vocab = {term: i for i, term in enumerate(terms)}
+
+        return cls(
+            vocab, indptr, doc_ids, tfs, doc_len, idf,
+            k1=k1, b=b, epsilon=epsilon, block_size=block_size
+        )
+
+    @staticmethod
+    def _compute_idf(df, corpus_size, epsilon):
+        """
+        Same rule as BM25Okapi: negative idf values are replaced by
+        epsilon * average idf.
+        """
+
+        idf = np.array([
+            math.log(corpus_size - n + 0.5) - math.log(n + 0.5)
+            for n in df.tolist()
+        ], dtype=np.float64)
+
+        if len(idf):
+            average_idf = sum(idf.tolist()) / len(idf)
+            idf[idf < 0] = epsilon * average_idf
+
+        return idf
+
+    def _build_block_max(self):
+
+        num_terms = len(self.indptr) - 1
+
+        impact = self.tfs * (self.k1 + 1) / (self.tfs + self.doc_norm[self.doc_ids])
+        post_term = np.repeat(np.arange(num_terms), np.diff(self.indptr))
+        post_block = self.doc_ids // self.block_size
+
+        # postings are sorted by (term, doc), so each (term, block)
+        # pair is one contiguous run
+        new_run = np.ones(len(self.doc_ids), dtype=bool)
+        new_run[1:] = (post_term[1:] != post_term[:-1]) | (post_block[1:] != post_block[:-1])
+        starts = np.flatnonzero(new_run)
+
+        self.bm_block = post_block[starts]
+        self.bm_post = np.append(starts, len(self.doc_ids))
+        self.bm_impact = (
+            np.maximum.reduceat(impact, starts) if len(starts) else np.zeros(0)
+        )
+
+        self.bm_indptr = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_term[starts], minlength=num_terms), out=self.bm_indptr[1:])
+
+        # per-term upper bound: best impact anywhere in the corpus
+        self.term_max_impact = np.zeros(num_terms)
+        has_postings = np.diff(self.bm_indptr) > 0
+        if has_postings.any():
+            self.term_max_impact[has_postings] = np.maximum.reduceat(
+                self.bm_impact, self.bm_indptr[:-1][has_postings]
+            )
+
+    # --------------------------------------------------
+    # SAVE / LOAD
+    # --------------------------------------------------
+
+    def save(self, path, corpus_fingerprint=None):
+        """
+        Write the index to directory `path`. meta.json is written last,
+        so a directory without it is an incomplete build.
+
+        corpus_fingerprint (see corpus_fingerprint()) is stored in the
+        metadata so loaders can tell whether the index matches a corpus.
+        """
+
+        os.makedirs(path, exist_ok=True)
+
+        meta_file = os.path.join(path, "meta.json")
+        if os.path.exists(meta_file):
+            os.remove(meta_file)
+
+        # vocabulary: UTF-8 terms in sorted order (= term id order),
+        # concatenated, with offsets - binary-searchable when mapped
+        if isinstance(self.vocab, Vocabulary):
+            blob, offsets = np.asarray(self.vocab.blob), np.asarray(self.vocab.offsets)
+        else:
+            encoded = [t.encode("utf-8") for t in sorted(self.vocab, key=self.vocab.get)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(t) for t in encoded], out=offsets[1:])
+            blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        np.save(os.path.join(path, "vocab_blob.npy"), blob)
+        np.save(os.path.join(path, "vocab_offsets.npy"), offsets)
+
+        for name in BASE_ARRAYS + DERIVED_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+        meta = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+            "block_size": self.block_size,
+            "avgdl": self.avgdl,
+            "corpus_size": self.corpus_size,
+            "corpus_fingerprint": corpus_fingerprint,
+            "num_terms": len(self.indptr) - 1,
+            "num_postings": len(self.doc_ids),
+            "built_at": datetime.now().isoformat()
+        }
+
+        with open(meta_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        return meta
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Open an index written by save(). With mmap=True every array is
+        memory-mapped, so load time does not grow with the corpus and
+        processes share the pages through the OS page cache.
+        """
+
+        meta = load_meta(path)
+
+        if meta.get("format") != FORMAT_NAME or meta.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has sparse index format {meta.get('format')} "
+                f"v{meta.get('version')}, expected {FORMAT_NAME} v{FORMAT_VERSION}. "
+                "Rebuild it with: python3 src/bm25_index.py"
+            )
+
+        mmap_mode = "r" if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        vocab = Vocabulary(array("vocab_blob"), array("vocab_offsets"))
+
+        return cls(
+            vocab,
+            *(array(name) for name in BASE_ARRAYS),
+            k1=meta["k1"],
+            b=meta["b"],
+            epsilon=meta["epsilon"],
+            block_size=meta["block_size"],
+            avgdl=meta["avgdl"],
+            derived={name: array(name) for name in DERIVED_ARRAYS}
+        )
+
+    # --------------------------------------------------
+    # SCORING
+    # --------------------------------------------------
+
+    def _score_postings(self, query_tokens):
+        """
+        Walk the postings of every query term (repeated terms count
+        again, as in BM25Okapi). Returns (doc ids, scores) for the
+        documents that contain at least one query term.
+        """
+
+        docs, contribs = [], []
+
+        for token in query_tokens:
+
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            d = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+
+            docs.append(d)
+            contribs.append(self.idf[term_id] * (tf * (self.k1 + 1) / (tf + self.doc_norm[d])))
+
+        return _accumulate(docs, contribs)
+
+    def get_scores(self, query_tokens):
+        """
+        Drop-in replacement for BM25Okapi.get_scores: one score per document.
+        """
+
+        scores = np.zeros(self.corpus_size, dtype=np.float64)
+        cand, cand_scores = self._score_postings(query_tokens)
+        scores[cand] = cand_scores
+
+        return scores
+
+    def top_k(self, query_tokens, k, prune=True, stats=None):
+        """
+        Best k documents as [(doc_id, score), ...], ordered by score
+        then doc id - the same order as
+            sorted(enumerate(get_scores(q)), key=lambda x: x[1], reverse=True)[:k]
+
+        prune: use block-max pruning (same results, fewer postings scored)
+        stats: optional dict, filled with postings / blocks touched
+        """
+
+        if prune:
+            results = self._top_k_block_max(query_tokens, k, stats)
+            if results is not None:
+                return results
+
+        cand, scores = self._score_postings(query_tokens)
+
+        if stats is not None:
+            term_ids = self._term_ids(query_tokens)
+            stats["postings_touched"] = int(sum(
+                self.indptr[t + 1] - self.indptr[t] for t in term_ids
+            ))
+            stats["postings_total"] = stats["postings_touched"]
+            stats["pruned"] = False
+
+        return _select_top_k(cand, scores, k, self.corpus_size)
+
+    # --------------------------------------------------
+    # BLOCK-MAX PRUNING
+    # --------------------------------------------------
+
+    def _term_ids(self, query_tokens):
+        return [
+            term_id for term_id in map(self.vocab.get, query_tokens)
+            if term_id is not None
+        ]
+
+    def _block_upper_bounds(self, term_ids):
+        """
+        Upper bound of the BM25 score of any document in each block:
+        sum over query terms of idf * block-max impact.
+        """
+
+        upper = np.zeros(self.num_blocks)
+
+        for term_id, count in Counter(term_ids).items():
+
+            # negative idf can only lower a score, so bound it by 0
+            weight = max(self.idf[term_id], 0.0) * count
+            start, end = self.bm_indptr[term_id], self.bm_indptr[term_id + 1]
+
+            # a term has at most one entry per block
+            upper[self.bm_block[start:end]] += weight * self.bm_impact[start:end]
+
+        return upper
+
+    def _postings_in_blocks(self, term_id, blocks):
+        """Posting positions of term_id that fall inside the sorted blocks."""
+
+        start, end = self.bm_indptr[term_id], self.bm_indptr[term_id + 1]
+        term_blocks = self.bm_block[start:end]
+
+        pos = np.searchsorted(term_blocks, blocks)
+        found = pos < len(term_blocks)
+        found[found] = term_blocks[pos[found]] == blocks[found]
+        entries = start + pos[found]
+
+        lo, hi = self.bm_post[entries], self.bm_post[entries + 1]
+        lengths = hi - lo
+
+        return np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def _term_upper_bounds(self, term_ids):
+        """Per-term upper bound on its total contribution to any document."""
+
+        return {
+            term_id: max(self.idf[term_id], 0.0) * count * self.term_max_impact[term_id]
+            for term_id, count in Counter(term_ids).items()
+        }
+
+    def _essential_terms(self, term_upper, threshold):
+        """
+        MaxScore split: the cheapest terms whose bounds add up to less
+        than the threshold are non-essential - a document matching
+        only those cannot enter the top k. Returns the essential set.
+        """
+
+        essential = set(term_upper)
+        total = 0.0
+
+        for term_id in sorted(term_upper, key=term_upper.get):
+            total += term_upper[term_id]
+            if total * (1 + 1e-9) >= threshold:
+                break
+            essential.discard(term_id)
+
+        return essential
+
+    def _score_blocks(self, term_ids, blocks, essential):
+        """
+        Exact scores, within the given blocks, for every document that
+        contains an essential term. Essential terms walk their block
+        postings; non-essential terms are only looked up for those
+        candidates. Contributions are added in query-term order like
+        _score_postings, so scores match exhaustive scoring exactly.
+
+        Returns (doc ids, scores, postings touched).
+        """
+
+        bs = self.block_size
+        blocks = np.sort(blocks)
+
+        # dense scratch space: slot i * bs + offset for the i-th block
+        slot = np.empty(self.num_blocks, dtype=np.int64)
+        slot[blocks] = np.arange(len(blocks))
+
+        def local(d):
+            return slot[d // bs] * bs + d % bs
+
+        positions = {t: self._postings_in_blocks(t, blocks) for t in essential}
+        touched = sum(len(p) for p in positions.values())
+
+        is_cand = np.zeros(len(blocks) * bs, dtype=bool)
+        for p in positions.values():
+            is_cand[local(self.doc_ids[p])] = True
+
+        cand_local = np.flatnonzero(is_cand)
+        cand = blocks[cand_local // bs] * bs + cand_local % bs
+
+        docs, contribs = [], []
+
+        for term_id in term_ids:
+
+            if term_id in positions:
+                p = positions[term_id]
+            else:
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                pos = np.searchsorted(self.doc_ids[start:end], cand)
+                hit = pos < end - start
+                hit[hit] = self.doc_ids[start + pos[hit]] == cand[hit]
+                p = start + pos[hit]
+                touched += len(p)
+
+            d = self.doc_ids[p]
+            tf = self.tfs[p]
+
+            docs.append(local(d))
+            contribs.append(self.idf[term_id] * (tf * (self.k1 + 1) / (tf + self.doc_norm[d])))
+
+        # bincount adds in term order, as in _accumulate
+        scores = np.bincount(
+            np.concatenate(docs), weights=np.concatenate(contribs), minlength=len(is_cand)
+        )
+
+        return cand, scores[cand_local], touched
+
+    def _top_k_block_max(self, query_tokens, k, stats=None):
+        """
+        Safe dynamic pruning (block-max MaxScore):
+        - blocks are scored in decreasing order of their upper bound,
+          stopping once the next bound cannot beat the k-th best score
+        - inside a block only documents containing an essential term
+          are scored (see _essential_terms)
+
+        Returns None when pruning cannot apply (fewer than k documents
+        with a positive score), so the caller falls back to exhaustive
+        scoring, which also handles zero-score padding.
+        """
+
+        term_ids = self._term_ids(query_tokens)
+        k = min(k, self.corpus_size)
+
+        if not term_ids or k <= 0:
+            return None
+
+        upper = self._block_upper_bounds(term_ids)
+        candidates = np.flatnonzero(upper > 0)
+        order = candidates[np.argsort(-upper[candidates], kind="stable")]
+
+        term_upper = self._term_upper_bounds(term_ids)
+
+        best_docs = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float64)
+        threshold = -np.inf
+
+        touched = 0
+        pos = 0
+        batch = 8
+
+        while pos < len(order):
+
+            # slack guards against the bound and the exact score
+            # rounding differently when they are mathematically equal
+            if len(best_docs) >= k and upper[order[pos]] * (1 + 1e-9) < threshold:
+                break
+
+            cand, scores, n = self._score_blocks(
+                term_ids,
+                order[pos:pos + batch],
+                self._essential_terms(term_upper, threshold)
+            )
+            touched += n
+            pos += batch
+            batch *= 2
+
+            keep = scores >= max(threshold, np.nextafter(0, 1))
+            best_docs = np.concatenate([best_docs, cand[keep]])
+            best_scores = np.concatenate([best_scores, scores[keep]])
+
+            if len(best_docs) >= k:
+                top = _select_top_k(best_docs, best_scores, k, self.corpus_size)
+                best_docs = np.array([d for d, _ in top], dtype=np.int64)
+                best_scores = np.array([sc for _, sc in top])
+                threshold = best_scores[-1]
+
+        if len(best_docs) < k:
+            return None
+
+        if stats is not None:
+            stats["postings_touched"] = touched
+            stats["postings_total"] = int(sum(
+                self.indptr[t + 1] - self.indptr[t] for t in term_ids
+            ))
+            stats["blocks_scored"] = int(min(pos, len(order)))
+            stats["blocks_total"] = int(len(order))
+            stats["pruned"] = True
+
+        return list(zip(best_docs.tolist(), best_scores.tolist()))
+
+
+def corpus_fingerprint(texts):
+    """sha256 of the chunk texts in order; changes whenever the corpus does."""
+
+    digest = hashlib.sha256()
+
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def load_meta(path):
+    """Read meta.json of a saved index, or {} if there is none."""
+
+    meta_file = os.path.join(path, "meta.json")
+
+    if not os.path.exists(meta_file):
+        return {}
+
+    with open(meta_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Vocabulary:
+    """
+    Read-only term -> term id lookup over the saved vocabulary arrays.
+    Terms are stored in sorted UTF-8 order, so lookup is a binary
+    search over the (possibly memory-mapped) blob - nothing is
+    decoded up front.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _term(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def get(self, term, default=None):
+
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self)
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < len(self) and self._term(lo) == key:
+            return lo
+
+        return default
+
+
+# ======================================================
+# ---------------- TOP-K SELECTION ---------------------
+# ======================================================
+
+def _accumulate(docs, contribs):
+    """
+    Sum per-term contributions per document. bincount adds them in
+    term order, like BM25Okapi's running "score +=", so results match
+    bit for bit.
+    """
+
+    if not docs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    docs = np.concatenate(docs)
+    contribs = np.concatenate(contribs)
+
+    cand, inverse = np.unique(docs, return_inverse=True)
+    scores = np.bincount(inverse.ravel(), weights=contribs, minlength=len(cand))
+
+    return cand, scores
+
+
+def _rank(docs, scores):
+    """Order by score descending, ties by ascending doc id."""
+
+    order = np.lexsort((docs, -scores))
+    return docs[order], scores[order]
+
+
+def _select_top_k(cand, scores, k, corpus_size):
+    """
+    Top-k over the scored candidates, treating every other document
+    as an implicit score of 0.
+    """
+
+    k = min(k, corpus_size)
+    if k <= 0:
+        return []
+
+    positive = scores > 0
+
+    if positive.sum() >= k:
+
+        cand, scores = cand[positive], scores[positive]
+
+        if len(scores) > k:
+            # keep everything tied with the k-th best so ties resolve by doc id
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            cand, scores = cand[keep], scores[keep]
+
+        docs, top = _rank(cand, scores)
+        return list(zip(docs[:k].tolist(), top[:k].tolist()))
+
+    # fewer than k positive matches: pad with zero-score documents
+    # (lowest ids first), then any negative-scored candidates
+    docs, top = _rank(cand[positive], scores[positive])
+    results = list(zip(docs.tolist(), top.tolist()))
+
+    nonzero = set(cand[scores != 0].tolist())
+    doc_id = 0
+    while len(results) < k and doc_id < corpus_size:
+        if doc_id not in nonzero:
+            results.append((doc_id, 0.0))
+        doc_id += 1
+
+    negative = scores < 0
+    if len(results) < k and negative.any():
+        docs, top = _rank(cand[negative], scores[negative])
+        results.extend(zip(docs.tolist(), top.tolist()))
+
+    return results[:k]